@@ -0,0 +1,111 @@
+"""
+Grouping benchmark: original pairwise loop vs. similarity index engines.
+
+    python benchmarks/bench_grouping.py --sizes 10000 100000 1000000
+
+Engines: 'mih' and 'bktree' are sub-linear indexes, 'numpy' is the exact
+vectorised brute force over packed uint64 hashes.
+
+Synthetic 64-bit hashes are random, with a fraction planted as near-duplicates
+(1-3 flipped bits) of earlier hashes. The pairwise loop is quadratic, so it is
+only run up to --naive-limit items; larger sizes report an extrapolation.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.hash_engine import HashEngine
+from core.group_builder import GroupBuilder
+
+
+def naive_build_groups(image_hashes, threshold=5):
+    """The original O(N^2) GroupBuilder.build_groups, kept as the baseline."""
+    groups = []
+    visited = set()
+    valid_hashes = [item for item in image_hashes if item[1] is not None]
+    for i in range(len(valid_hashes)):
+        path_i, hash_i = valid_hashes[i]
+        if path_i in visited:
+            continue
+        current_group = [path_i]
+        visited.add(path_i)
+        for j in range(i + 1, len(valid_hashes)):
+            path_j, hash_j = valid_hashes[j]
+            if path_j in visited:
+                continue
+            if hash_i - hash_j <= threshold:
+                current_group.append(path_j)
+                visited.add(path_j)
+        if len(current_group) > 1:
+            groups.append(current_group)
+    return groups
+
+
+def generate_hashes(count, duplicate_ratio=0.1, seed=0):
+    rng = random.Random(seed)
+    values = []
+    for i in range(count):
+        if values and rng.random() < duplicate_ratio:
+            value = rng.choice(values)
+            for _ in range(rng.randint(1, 3)):
+                value ^= 1 << rng.randrange(64)
+        else:
+            value = rng.getrandbits(64)
+        values.append(value)
+    return [(f"img_{i:07d}.jpg", v) for i, v in enumerate(values)]
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--engines', nargs='+', default=['mih', 'bktree', 'numpy'])
+    parser.add_argument('--threshold', type=int, default=5)
+    parser.add_argument('--naive-limit', type=int, default=20000,
+                        help='largest size the pairwise loop is actually run on')
+    parser.add_argument('--bktree-limit', type=int, default=100000,
+                        help='largest size the BK-tree is run on (it degrades on uniform hashes)')
+    parser.add_argument('--numpy-limit', type=int, default=200000,
+                        help='largest size the packed brute-force engine is run on')
+    args = parser.parse_args()
+
+    naive_rate = None  # seconds per pair comparison, for extrapolation
+    print(f"{'size':>9} {'engine':>8} {'seconds':>10} {'groups':>8}")
+    for size in args.sizes:
+        items = generate_hashes(size)
+
+        if size <= args.naive_limit:
+            objects = [(p, HashEngine.int_to_hash(v)) for p, v in items]
+            seconds, expected = timed(naive_build_groups, objects, args.threshold)
+            naive_rate = seconds / max(1, size * (size - 1) / 2)
+            print(f"{size:>9} {'naive':>8} {seconds:>10.2f} {len(expected):>8}")
+        else:
+            expected = None
+            if naive_rate is not None:
+                estimate = naive_rate * size * (size - 1) / 2
+                print(f"{size:>9} {'naive':>8} {'~' + format(estimate, '.0f'):>10} {'(est.)':>8}")
+
+        for engine in args.engines:
+            limit = {'bktree': args.bktree_limit, 'numpy': args.numpy_limit}.get(engine)
+            if limit is not None and size > limit:
+                print(f"{size:>9} {engine:>8} {'skipped':>10}")
+                continue
+            source = objects if expected is not None else items
+            seconds, groups = timed(GroupBuilder.build_groups, source, args.threshold, engine)
+            note = ''
+            if expected is not None and groups != expected:
+                note = '  MISMATCH'
+            print(f"{size:>9} {engine:>8} {seconds:>10.2f} {len(groups):>8}{note}")
+
+
+if __name__ == "__main__":
+    main()
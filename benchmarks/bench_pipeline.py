@@ -0,0 +1,252 @@
+"""
+Core pipeline benchmark on a synthetic library.
+
+    python benchmarks/bench_pipeline.py --images 2000 --videos 20 --json result.json
+    python benchmarks/bench_pipeline.py --images 2000 --baseline result.json
+
+A library with planted exact duplicates, near-duplicates, blurred copies
+and videos is generated (see synthetic_library.py), then each stage is
+timed on its own in this process:
+
+    scan       Scanner walk (threaded walker)
+    blur       BlurDetector.calculate_blur_score per image
+    hash       HashEngine.compute_hash per image
+    extract    FeatureExtractor.extract per image (the single decode the scan uses)
+    video      VideoHash.compute_hash per video
+    group      GroupBuilder.build_groups (union_find) over all hashes
+    rules      RuleEngine.apply_rules per group
+    pipeline   ScanPipeline end to end with --workers processes and a cold cache
+    rescan     the same with the cache filled
+    execute    Executor.execute_actions on copies of the group files
+
+For each stage the table shows seconds, items per second and peak RSS.
+On Linux the peak is reset before every stage, elsewhere it is the peak
+of the process so far. The pipeline stages also show the largest worker
+process. Accuracy is checked against the planted duplicates.
+
+--json saves the results; --baseline compares against saved results and
+exits with status 1 when a stage is slower than --tolerance allows.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.scanner import Scanner
+from core.blur_detector import BlurDetector
+from core.hash_engine import HashEngine
+from core.feature_extractor import FeatureExtractor
+from core.video_hash import VideoHash
+from core.group_builder import GroupBuilder
+from core.rule_engine import RuleEngine
+from core.executor import Executor
+from core.pipeline import ScanPipeline
+from synthetic_library import generate_library
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def reset_peak_rss() -> bool:
+    """Resets the peak RSS of this process (Linux only)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak RSS of this process in MB, or None if it cannot be read."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return None
+
+
+def children_peak_rss_mb():
+    """Largest peak RSS of any finished child process in MB, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_stage(results, name, items, func):
+    reset_peak_rss()
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    results[name] = {
+        'seconds': seconds,
+        'items': items,
+        'per_second': items / seconds if seconds > 0 else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    return value
+
+
+def planted_accuracy(groups, manifest):
+    """
+    Recall: share of files with a planted duplicate that share a group with it.
+    Purity: share of groups whose files all come from one original.
+    """
+    files = manifest['files']
+    sources = {}
+    for path, info in files.items():
+        sources.setdefault(info['source'], []).append(path)
+    expected = {path for paths in sources.values() if len(paths) > 1 for path in paths}
+    group_of = {path: i for i, group in enumerate(groups) for path in group}
+    found = sum(1 for path in expected
+                if any(group_of.get(other, -1) == group_of.get(path, -2)
+                       for other in sources[files[path]['source']] if other != path))
+    pure = sum(1 for group in groups if len({files[p]['source'] for p in group if p in files}) == 1)
+    return {
+        'recall': found / len(expected) if expected else 1.0,
+        'purity': pure / len(groups) if groups else 1.0,
+    }
+
+
+def blur_accuracy(scores, manifest, threshold=50.0):
+    """Share of blurred copies detected, and share of other images flagged blurry."""
+    files = manifest['files']
+    blurred = [p for p, info in files.items() if info['kind'] == 'blur']
+    sharp = [p for p, info in files.items() if info['kind'] in ('original', 'exact')]
+    return {
+        'blur_recall': sum(BlurDetector.is_blurry(scores[p], threshold) for p in blurred) / max(1, len(blurred)),
+        'false_blurry': sum(BlurDetector.is_blurry(scores[p], threshold) for p in sharp) / max(1, len(sharp)),
+    }
+
+
+def fmt(value, pattern):
+    return pattern.format(value) if value is not None else 'n/a'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=500)
+    parser.add_argument('--videos', type=int, default=10)
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=1200)
+    parser.add_argument('--workers', type=int, default=None, help='pipeline processes (default: every core)')
+    parser.add_argument('--decode-size', type=int, default=1024)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--library', help='reuse or keep the library in this directory')
+    parser.add_argument('--json', help='save the results to this file')
+    parser.add_argument('--baseline', help='compare against results saved with --json')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='pipeline_bench_')
+    root = os.path.abspath(args.library) if args.library else os.path.join(work, 'library')
+    try:
+        manifest_path = os.path.join(root, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        else:
+            start = time.perf_counter()
+            manifest = generate_library(root, args.images, args.videos, size=(args.width, args.height),
+                                        seed=args.seed)
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            print(f"Generated {len(manifest['files'])} files in {time.perf_counter() - start:.1f} s")
+
+        images = [p for p in sorted(manifest['files']) if not p.endswith('.mp4')]
+        videos = [p for p in sorted(manifest['files']) if p.endswith('.mp4')]
+        decode = args.decode_size or None
+        stages = {}
+
+        records = run_stage(stages, 'scan', len(manifest['files']),
+                            lambda: list(Scanner.iter_files_parallel(root, workers=8, ordered=True)))
+        scores = run_stage(stages, 'blur', len(images),
+                           lambda: {p: BlurDetector.calculate_blur_score(p, decode) for p in images})
+        run_stage(stages, 'hash', len(images),
+                  lambda: {p: HashEngine.compute_hash(p, target_size=decode) for p in images})
+        features = run_stage(stages, 'extract', len(images),
+                             lambda: {p: FeatureExtractor.extract(p, target_size=decode) for p in images})
+        video_hashes = run_stage(stages, 'video', len(videos),
+                                 lambda: {p: VideoHash.compute_hash(p) for p in videos})
+
+        hashes = [(p, features[p]['hash']) for p in images] + list(video_hashes.items())
+        groups = run_stage(stages, 'group', len(hashes),
+                           lambda: GroupBuilder.build_groups(hashes, mode='union_find'))
+        actions = run_stage(stages, 'rules', len(groups), lambda: {
+            path: action for group in groups
+            for path, action in RuleEngine.apply_rules(group, blur_scores=scores).items()})
+
+        # Cache, snapshots and checkpoints stay in the work directory, not the user's
+        cache_path = os.path.join(work, 'cache.db')
+        for stage in ('pipeline', 'rescan'):
+            pipeline = ScanPipeline(root, cache_path=cache_path, workers=args.workers, decode_size=decode,
+                                    walker_threads=8, snapshot_dir=os.path.join(work, 'snapshots'))
+            results = run_stage(stages, stage, len(manifest['files']), pipeline.run)
+            stages[stage]['children_peak_rss_mb'] = children_peak_rss_mb()
+
+        # Executor moves files: run it on copies so the library stays reusable
+        scratch = os.path.join(work, 'execute')
+        copied = {}
+        for path, action in actions.items():
+            copy = os.path.join(scratch, os.path.relpath(path, root))
+            os.makedirs(os.path.dirname(copy), exist_ok=True)
+            shutil.copyfile(path, copy)
+            copied[copy] = action
+        to_delete = sum(1 for action in actions.values() if action == 'delete')
+        run_stage(stages, 'execute', to_delete, lambda: Executor.execute_actions(copied, backup_root=scratch))
+
+        accuracy = planted_accuracy(results['groups'], manifest)
+        accuracy.update(blur_accuracy(results['blur_scores'], manifest))
+        accuracy['scanned'] = len(records)
+
+        print(f"{len(images)} images, {len(videos)} videos, {len(groups)} groups, "
+              f"{to_delete} delete candidates, {os.cpu_count()} CPUs")
+        if not reset_peak_rss():
+            print("Peak RSS cannot be reset on this platform; it is the peak so far")
+        print(f"{'stage':>10} {'seconds':>9} {'items/s':>10} {'peak MB':>9} {'workers MB':>11}")
+        for name, stage in stages.items():
+            print(f"{name:>10} {stage['seconds']:>9.2f} {fmt(stage['per_second'], '{:.1f}'):>10} "
+                  f"{fmt(stage['peak_rss_mb'], '{:.0f}'):>9} {fmt(stage.get('children_peak_rss_mb'), '{:.0f}'):>11}")
+        print("accuracy: " + ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+                                      for k, v in accuracy.items()))
+
+        report = {'args': vars(args), 'cpus': os.cpu_count(), 'stages': stages, 'accuracy': accuracy}
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = []
+            for name, stage in stages.items():
+                before = baseline['stages'].get(name)
+                if before and stage['seconds'] > before['seconds'] * (1 + args.tolerance):
+                    regressions.append(f"{name}: {before['seconds']:.2f} s -> {stage['seconds']:.2f} s")
+            for name in ('recall', 'purity', 'blur_recall'):
+                if accuracy[name] < baseline['accuracy'].get(name, 0) - 1e-9:
+                    regressions.append(f"{name}: {baseline['accuracy'][name]:.3f} -> {accuracy[name]:.3f}")
+            if regressions:
+                print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+                sys.exit(1)
+            print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
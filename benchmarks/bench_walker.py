@@ -0,0 +1,84 @@
+"""
+Directory walker benchmark: sequential scandir walk vs. threaded walker.
+
+    python benchmarks/bench_walker.py --depth 4 --fanout 4 --latency-ms 2
+
+A synthetic tree (fanout^depth leaf directories, --files empty .jpg files
+each) is built in a temporary directory. Every directory listing is delayed
+by --latency-ms to imitate a network share, where round trips rather than
+CPU dominate. The threaded walker is checked to return exactly the same
+files, in the same order, as the sequential one.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.scanner import Scanner
+
+
+def build_tree(root, depth, fanout, files):
+    count = 0
+    for i in range(files):
+        open(os.path.join(root, f"img_{i:03d}.jpg"), 'wb').close()
+        count += 1
+    if depth > 0:
+        for d in range(fanout):
+            child = os.path.join(root, f"dir_{d:02d}")
+            os.mkdir(child)
+            count += build_tree(child, depth - 1, fanout, files)
+    return count
+
+
+def with_latency(latency):
+    """Wraps os.scandir so each listing sleeps for latency seconds."""
+    original = os.scandir
+
+    def slow_scandir(path='.'):
+        time.sleep(latency)
+        return original(path)
+    return original, slow_scandir
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fanout', type=int, default=4)
+    parser.add_argument('--files', type=int, default=5, help='files per directory')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='delay added to every listing')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8, 16])
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='walker_bench_')
+    try:
+        total = build_tree(root, args.depth, args.fanout, args.files)
+        print(f"{total} files, latency {args.latency_ms} ms per directory")
+
+        original, slow_scandir = with_latency(args.latency_ms / 1000)
+        os.scandir = slow_scandir
+        try:
+            seconds, expected = timed(lambda: list(Scanner.iter_files(root)))
+            print(f"{'walker':>12} {'seconds':>10} {'files/s':>10}")
+            print(f"{'sequential':>12} {seconds:>10.2f} {len(expected) / seconds:>10.0f}")
+            for workers in args.workers:
+                seconds, records = timed(lambda: list(Scanner.iter_files_parallel(root, workers, ordered=True)))
+                note = '' if records == expected else '  MISMATCH'
+                print(f"{f'threads={workers}':>12} {seconds:>10.2f} {len(records) / seconds:>10.0f}{note}")
+        finally:
+            os.scandir = original
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
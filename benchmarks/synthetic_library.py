@@ -0,0 +1,139 @@
+"""
+Synthetic photo library with planted duplicates, for benchmarks.
+
+    python benchmarks/synthetic_library.py OUT_DIR --images 1000 --videos 20
+
+Every original image is a random low-frequency pattern, so originals never
+resemble each other. From a seeded fraction of them the generator plants:
+
+    exact   byte-identical copies in another directory
+    near    resized and recompressed copies (perceptually similar)
+    blur    Gaussian-blurred copies (should be detected as blurry)
+
+Videos are short MP4 clips of a drifting pattern; a fraction get a
+re-encoded, downscaled copy. The same seed always produces the same files.
+The returned manifest maps every file to the original it was made from,
+which is how benchmark results are checked for accuracy.
+"""
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+from typing import Dict, Any
+import numpy as np
+import cv2
+from PIL import Image, ImageFilter
+
+
+def pattern(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """Random low-frequency RGB pattern with some fine texture, as uint8 HxWx3."""
+    coarse = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    image = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC).astype(np.int16)
+    image += rng.integers(-24, 25, (height, width, 3), dtype=np.int16)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def write_video(path: str, frames: np.ndarray, size, fps: int = 10):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for frame in frames:
+        writer.write(cv2.resize(frame, size))
+    writer.release()
+
+
+def generate_library(root: str, images: int = 1000, videos: int = 0, exact_ratio: float = 0.1,
+                     near_ratio: float = 0.1, blur_ratio: float = 0.05, video_dup_ratio: float = 0.3,
+                     files_per_dir: int = 200, size=(640, 480), seed: int = 0) -> Dict[str, Any]:
+    """
+    Writes a library under root (which must not exist yet).
+
+    Args:
+        images: Number of original images; planted copies come on top.
+        videos: Number of original videos.
+        exact_ratio, near_ratio, blur_ratio: Fraction of originals that get
+            an exact, a near-duplicate and a blurred copy.
+        video_dup_ratio: Fraction of videos that get a re-encoded copy.
+        files_per_dir: Files per directory before a new one is started.
+        size: (width, height) of the originals.
+
+    Returns:
+        Manifest: {'files': {path: {'source': original id, 'kind': ...}},
+        'seed', 'images', 'videos'}. kind is 'original', 'exact', 'near',
+        'blur', 'video' or 'video_near'.
+    """
+    rng = np.random.default_rng(seed)
+    choice = random.Random(seed)
+    os.makedirs(root)
+    files = {}
+    counter = [0]
+
+    def next_path(ext: str) -> str:
+        index = counter[0]
+        counter[0] += 1
+        directory = os.path.join(root, f"dir_{index // files_per_dir:04d}")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"file_{index:07d}{ext}")
+
+    width, height = size
+    for i in range(images):
+        source = f"img{i}"
+        path = next_path('.jpg')
+        pixels = pattern(rng, width, height)
+        Image.fromarray(pixels).save(path, quality=90)
+        files[path] = {'source': source, 'kind': 'original'}
+
+        if choice.random() < exact_ratio:
+            copy = next_path('.jpg')
+            shutil.copyfile(path, copy)
+            files[copy] = {'source': source, 'kind': 'exact'}
+        if choice.random() < near_ratio:
+            scale = choice.uniform(0.5, 0.8)
+            near = next_path('.jpg')
+            Image.fromarray(pixels).resize((int(width * scale), int(height * scale))).save(
+                near, quality=choice.randint(40, 70))
+            files[near] = {'source': source, 'kind': 'near'}
+        if choice.random() < blur_ratio:
+            blurred = next_path('.jpg')
+            Image.fromarray(pixels).filter(ImageFilter.GaussianBlur(6)).save(blurred, quality=90)
+            files[blurred] = {'source': source, 'kind': 'blur'}
+
+    for i in range(videos):
+        source = f"video{i}"
+        base = pattern(rng, 320, 240)
+        frames = np.stack([np.roll(base, shift * 2, axis=1) for shift in range(30)])
+        path = next_path('.mp4')
+        write_video(path, frames, (320, 240))
+        files[path] = {'source': source, 'kind': 'video'}
+        if choice.random() < video_dup_ratio:
+            copy = next_path('.mp4')
+            write_video(copy, frames, (160, 120))
+            files[copy] = {'source': source, 'kind': 'video_near'}
+
+    return {'files': files, 'seed': seed, 'images': images, 'videos': videos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', help='output directory (must not exist)')
+    parser.add_argument('--images', type=int, default=1000)
+    parser.add_argument('--videos', type=int, default=0)
+    parser.add_argument('--exact-ratio', type=float, default=0.1)
+    parser.add_argument('--near-ratio', type=float, default=0.1)
+    parser.add_argument('--blur-ratio', type=float, default=0.05)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if os.path.exists(args.root):
+        sys.exit(f"{args.root} already exists")
+
+    manifest = generate_library(args.root, args.images, args.videos, args.exact_ratio, args.near_ratio,
+                                args.blur_ratio, size=(args.width, args.height), seed=args.seed)
+    with open(os.path.join(args.root, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    print(f"{len(manifest['files'])} files written to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
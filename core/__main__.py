@@ -0,0 +1,8 @@
+import sys
+import multiprocessing
+from .cli import main
+
+if __name__ == "__main__":
+    # Needed for the feature extraction process pool in frozen builds
+    multiprocessing.freeze_support()
+    sys.exit(main())
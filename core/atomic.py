@@ -0,0 +1,51 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+def fsync_directory(directory: str):
+    """Makes a rename in directory durable. Not supported on Windows."""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_write(path: str, mode: str = 'wb', encoding: str = None, durable: bool = True):
+    """
+    Opens a file for writing that replaces path only once it is complete.
+
+    Data goes to a temporary file in the same directory, which is flushed,
+    fsynced and renamed over path with os.replace. If the block raises or
+    the process dies, path keeps its previous content. The temporary name
+    is unique, so threads and processes may write the same path at once.
+    With durable=False nothing is fsynced, for files that can be made again.
+
+    Usage:
+        with atomic_write(path, 'w', encoding='utf-8') as f:
+            f.write(...)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if durable:
+        fsync_directory(directory)
@@ -1,12 +1,51 @@
+import io
 import cv2
 import numpy as np
+from PIL import Image
 
 class BlurDetector:
+    # cv2 flags that let the JPEG decoder scale down by 1/2, 1/4 or 1/8
+    REDUCED_FLAGS = {
+        1: cv2.IMREAD_GRAYSCALE,
+        2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+        4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+        8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    }
+    # Shrinking an image by k scales its Laplacian roughly by k^2 near the
+    # blur threshold, so reduced scores are divided by k^SCALE_EXPONENT to
+    # stay comparable with full-resolution ones. This is an approximation:
+    # blur finer than the reduced pixel grid can no longer be seen.
+    SCALE_EXPONENT = 2.0
+
+    @staticmethod
+    def reduction_factor(width: int, height: int, target_size: int = None) -> int:
+        """
+        Largest decode reduction (1, 2, 4 or 8) that keeps the longest side
+        at or above target_size. None means full resolution.
+        """
+        if not target_size:
+            return 1
+        longest = max(width, height)
+        factor = 1
+        while factor < 8 and longest // (factor * 2) >= target_size:
+            factor *= 2
+        return factor
+
+    @staticmethod
+    def normalize_score(score: float, factor: int) -> float:
+        """Maps a score measured at 1/factor scale onto the full-resolution scale."""
+        return score / (factor ** BlurDetector.SCALE_EXPONENT)
+
     @staticmethod
-    def calculate_blur_score(image_path: str) -> float:
+    def calculate_blur_score(image_path: str, target_size: int = None) -> float:
         """
         Calculates the Laplacian variance of the image.
         Lower score means more blurry.
+        
+        Args:
+            image_path: Image file.
+            target_size: If set, decode at a reduced resolution whose longest
+                         side is still at least this many pixels.
         """
         try:
             # Read image using opencv
@@ -15,14 +54,21 @@ class BlurDetector:
             stream = open(image_path, "rb")
             bytes_data = stream.read()
             array = np.frombuffer(bytes_data, dtype=np.uint8)
-            image = cv2.imdecode(array, cv2.IMREAD_GRAYSCALE)
             stream.close()
+            
+            factor = 1
+            if target_size:
+                # Header only, no pixels are decoded here
+                width, height = Image.open(io.BytesIO(bytes_data)).size
+                factor = BlurDetector.reduction_factor(width, height, target_size)
+            image = cv2.imdecode(array, BlurDetector.REDUCED_FLAGS[factor])
 
             if image is None:
                 print(f"Warning: Could not decode image {image_path}")
                 return 0.0
 
-            return cv2.Laplacian(image, cv2.CV_64F).var()
+            score = cv2.Laplacian(image, cv2.CV_64F).var()
+            return BlurDetector.normalize_score(score, factor)
         except (OSError, IOError) as e:
             print(f"Warning: Could not read file {image_path}: {e}")
             return 0.0
@@ -1,48 +1,268 @@
-import pickle
 import os
+import time
+import pickle
+import sqlite3
 from typing import Dict, Any
+import imagehash
+from .scanner import FileRecord
 
 class Cache:
-    def __init__(self, cache_file: str = ".image_cache.pkl"):
+    """
+    Cache of hashes, blur scores and image sizes, stored in SQLite.
+
+    Each entry records the decode size its features were computed at (0 =
+    full resolution). Blur scores of reduced decodes are only approximately
+    comparable, so entries made at another decode size are misses.
+
+    With cache_path set (see default_path()) one database is shared by
+    every scan root; otherwise it lives inside each scanned folder.
+    Entries are found by path, then by file identity (device, inode, size,
+    mtime_ns), and optionally by content hash, so moved, renamed or
+    re-mounted files reuse their features.
+
+    Entries are read on demand instead of loading the whole cache, and
+    writes are buffered and upserted in batched transactions, committed
+    every batch_size entries or flush_interval seconds. The database runs
+    in WAL mode, where a commit is an append to the write-ahead journal and
+    SQLite checkpoints it into the database, so killing the app mid-scan
+    loses at most the last few seconds of work and never the cache itself.
+    """
+    SCHEMA_VERSION = 4
+    COLUMNS = ("path, dev, inode, size, mtime, mtime_ns, content_hash, hash, blur_score, width, height, "
+               "decode_size")
+
+    def __init__(self, cache_file: str = ".image_cache.db", legacy_file: str = ".image_cache.pkl",
+                 batch_size: int = 500, cache_path: str = None, flush_interval: float = 5.0,
+                 decode_size: int = None):
         self.cache_file = cache_file
-        self.data = {}
-        
+        self.legacy_file = legacy_file
+        self.batch_size = batch_size
+        self.cache_path = cache_path
+        self.flush_interval = flush_interval
+        self.decode_size = decode_size or 0  # decode size of the features looked up and stored
+        self.conn = None
+        self.pending = {}  # path -> row waiting for the next commit
+        self.last_save = time.monotonic()
+
+    @staticmethod
+    def default_path() -> str:
+        """User-level cache location, next to the settings file."""
+        return os.path.join(os.path.expanduser("~"), '.duplicate_cleaner_cache.db')
+
     def load(self, folder: str):
-        """Load cache from folder."""
-        cache_path = os.path.join(folder, self.cache_file)
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'rb') as f:
-                    self.data = pickle.load(f)
-                print(f"Loaded cache with {len(self.data)} entries")
-            except Exception as e:
-                print(f"Failed to load cache: {e}")
-                self.data = {}
+        """
+        Open the cache database and import older caches found in folder:
+        a legacy pickle, and a per-folder database when using a shared one.
+        """
+        self.close()
+        if self.cache_path:
+            db_path = self.cache_path
         else:
-            self.data = {}
-            
-    def save(self, folder: str):
-        """Save cache to folder."""
-        cache_path = os.path.join(folder, self.cache_file)
+            db_path = os.path.join(folder, self.cache_file)
         try:
-            with open(cache_path, 'wb') as f:
-                pickle.dump(self.data, f)
-            print(f"Saved cache with {len(self.data)} entries")
+            self.conn = sqlite3.connect(db_path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema()
+            self._migrate_pickle(folder)
+            if self.cache_path:
+                self._migrate_folder_db(folder)
+            count = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            print(f"Loaded cache with {count} entries")
+        except Exception as e:
+            print(f"Failed to load cache: {e}")
+            self.conn = None
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER,"
+                " mtime REAL,"
+                " hash TEXT,"
+                " blur_score REAL)"
+            )
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 2:
+                existing = {row[1] for row in self.conn.execute("PRAGMA table_info(entries)")}
+                for column in ("dev INTEGER", "inode INTEGER", "mtime_ns INTEGER", "content_hash TEXT"):
+                    if column.split()[0] not in existing:
+                        self.conn.execute(f"ALTER TABLE entries ADD COLUMN {column}")
+            if version < 3:
+                existing = {row[1] for row in self.conn.execute("PRAGMA table_info(entries)")}
+                for column in ("width INTEGER", "height INTEGER"):
+                    if column.split()[0] not in existing:
+                        self.conn.execute(f"ALTER TABLE entries ADD COLUMN {column}")
+            if version < 4:
+                existing = {row[1] for row in self.conn.execute("PRAGMA table_info(entries)")}
+                if "decode_size" not in existing:
+                    # Older entries have no decode size (NULL) and are never matched
+                    self.conn.execute("ALTER TABLE entries ADD COLUMN decode_size INTEGER")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_size_mtime ON entries (size, mtime)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_identity ON entries (dev, inode, size, mtime_ns)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_content ON entries (content_hash)")
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def _migrate_pickle(self, folder: str):
+        """Import entries from the old .image_cache.pkl and rename it out of the way."""
+        legacy_path = os.path.join(folder, self.legacy_file)
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'rb') as f:
+                legacy = pickle.load(f)
+            rows = [
+                (path, entry.get('mtime'), self._encode_hash(entry.get('hash')), entry.get('blur_score'))
+                for path, entry in legacy.items()
+            ]
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO entries (path, mtime, hash, blur_score) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+            os.replace(legacy_path, legacy_path + ".migrated")
+            print(f"Migrated {len(rows)} entries from {self.legacy_file}")
+        except Exception as e:
+            print(f"Failed to migrate legacy cache: {e}")
+
+    def _migrate_folder_db(self, folder: str):
+        """Import a per-folder database into the shared one and rename it out of the way."""
+        folder_db = os.path.join(folder, self.cache_file)
+        if not os.path.exists(folder_db) or os.path.abspath(folder_db) == os.path.abspath(self.cache_path):
+            return
+        try:
+            self.conn.execute("ATTACH DATABASE ? AS folder_cache", (folder_db,))
+            try:
+                with self.conn:
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO entries (path, size, mtime, hash, blur_score) "
+                        "SELECT path, size, mtime, hash, blur_score FROM folder_cache.entries"
+                    )
+            finally:
+                self.conn.execute("DETACH DATABASE folder_cache")
+            os.replace(folder_db, folder_db + ".migrated")
+            print(f"Migrated {cursor.rowcount} entries from {folder_db}")
+        except Exception as e:
+            print(f"Failed to migrate folder cache: {e}")
+
+    def save(self, folder: str = None):
+        """Commit buffered entries. folder is accepted for compatibility."""
+        self.last_save = time.monotonic()
+        if self.conn is None or not self.pending:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    f"INSERT INTO entries ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET dev = excluded.dev, inode = excluded.inode, "
+                    "size = excluded.size, mtime = excluded.mtime, mtime_ns = excluded.mtime_ns, "
+                    "content_hash = excluded.content_hash, "
+                    "hash = excluded.hash, blur_score = excluded.blur_score, "
+                    "width = excluded.width, height = excluded.height, decode_size = excluded.decode_size",
+                    list(self.pending.values())
+                )
+            print(f"Saved {len(self.pending)} cache entries")
+            self.pending = {}
         except Exception as e:
             print(f"Failed to save cache: {e}")
-            
-    def get(self, file_path: str, mtime: float) -> Dict[str, Any]:
-        """Get cached data if file hasn't changed."""
-        if file_path in self.data:
-            cached = self.data[file_path]
-            if cached.get('mtime') == mtime:
-                return cached
-        return None
-        
-    def set(self, file_path: str, mtime: float, hash_value, blur_score: float):
-        """Set cache entry."""
-        self.data[file_path] = {
-            'mtime': mtime,
-            'hash': hash_value,
-            'blur_score': blur_score
+
+    def close(self):
+        """Commit pending entries and close the database."""
+        if self.conn is not None:
+            self.save()
+            self.conn.close()
+            self.conn = None
+
+    @staticmethod
+    def _encode_hash(hash_value):
+        return str(hash_value) if hash_value is not None else None
+
+    @staticmethod
+    def _decode_hash(text):
+        return imagehash.hex_to_hash(text) if text else None
+
+    @staticmethod
+    def _to_entry(row) -> Dict[str, Any]:
+        return {
+            'mtime': row[4],
+            'size': row[3],
+            'content_hash': row[6],
+            'hash': Cache._decode_hash(row[7]),
+            'blur_score': row[8],
+            'width': row[9],
+            'height': row[10]
         }
+
+    def _select(self, where: str, params) -> tuple:
+        if self.conn is None:
+            return None
+        return self.conn.execute(f"SELECT {self.COLUMNS} FROM entries WHERE {where} LIMIT 1", params).fetchone()
+
+    def _adopt(self, file_path: str, row, mtime: float, record: FileRecord):
+        """Record a match found by identity or content under the new path."""
+        self.set(file_path, mtime, self._decode_hash(row[7]), row[8], record=record, content_hash=row[6],
+                 width=row[9], height=row[10])
+
+    def get(self, file_path: str, mtime: float, record: FileRecord = None) -> Dict[str, Any]:
+        """
+        Get cached data if file hasn't changed.
+
+        Args:
+            file_path: File to look up.
+            mtime: Modification time as returned by os.path.getmtime.
+            record: Optional FileRecord from Scanner. Enables lookup by file identity,
+                which finds files that were moved, renamed or rescanned
+                from another root.
+        """
+        row = self.pending.get(file_path)
+        if row is None:
+            row = self._select("path = ?", (file_path,))
+        if row is not None and row[11] == self.decode_size:
+            if record is not None and row[5] is not None:
+                unchanged = row[5] == record.mtime_ns and row[3] == record.size
+            else:
+                unchanged = row[4] == mtime
+            if unchanged:
+                return self._to_entry(row)
+
+        # Some filesystems report no inode numbers; identity is meaningless there
+        if record is not None and record.inode:
+            row = self._select(
+                "dev = ? AND inode = ? AND size = ? AND mtime_ns = ? AND decode_size = ?",
+                (record.dev, record.inode, record.size, record.mtime_ns, self.decode_size)
+            )
+            if row is not None:
+                self._adopt(file_path, row, mtime, record)
+                return self._to_entry(row)
+        return None
+
+    def get_by_content(self, file_path: str, content_hash: str, mtime: float,
+                       record: FileRecord = None) -> Dict[str, Any]:
+        """
+        Fallback lookup by content hash (ExactDuplicateFinder.full_hash).
+        A match is recorded under file_path for future lookups.
+        """
+        row = self._select("content_hash = ? AND hash IS NOT NULL AND decode_size = ?",
+                           (content_hash, self.decode_size))
+        if row is None:
+            return None
+        self._adopt(file_path, row, mtime, record)
+        return self._to_entry(row)
+
+    def set(self, file_path: str, mtime: float, hash_value, blur_score: float, size: int = None,
+            record: FileRecord = None, content_hash: str = None, width: int = None, height: int = None):
+        """
+        Set cache entry. Entries are committed in batches (see the class docstring).
+        width and height are the image size, None when it is unknown (videos,
+        undecodable files).
+        """
+        dev = inode = mtime_ns = None
+        if record is not None:
+            dev, inode, size, mtime_ns = record.dev, record.inode, record.size, record.mtime_ns
+        self.pending[file_path] = (file_path, dev, inode, size, mtime, mtime_ns, content_hash,
+                                   self._encode_hash(hash_value), blur_score, width, height, self.decode_size)
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_save >= self.flush_interval:
+            self.save()
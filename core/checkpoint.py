@@ -0,0 +1,172 @@
+import os
+import time
+import pickle
+import threading
+from typing import List, Tuple, Optional
+from .scanner import FileRecord
+from .snapshot import ScanSnapshot
+
+class ScanCheckpoint:
+    """
+    Append-only journal of a running scan, so a stopped or crashed scan
+    can be resumed without walking the tree or decoding files again.
+
+    The journal records each listed directory (its files and subdirectories)
+    and the features of each processed file. Byte-identical copies are not
+    recorded: finding them again only reads file contents, not decodes them.
+    Entries are pickled frames appended to one file, flushed and fsynced
+    every flush_interval seconds; a frame torn by a crash is dropped on load.
+    """
+    VERSION = 2
+
+    def __init__(self, root: str, directory: str = None, flush_interval: float = 5.0, decode_size: int = None):
+        self.root = root  # as passed to the walker; listings are keyed by absolute path
+        self.file_path = ScanCheckpoint.path_for(root, directory)
+        self.flush_interval = flush_interval
+        self.decode_size = decode_size or 0  # journalled features are only resumed at the same decode size
+        self.listings = {}  # directory -> (files, subdirectories)
+        self.features = {}  # path -> (hash as int or None, blur_score, width, height)
+        self.file = None
+        self.pending_features = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()  # listings arrive from walker threads
+
+    def _header(self) -> Tuple:
+        return ('header', self.VERSION, os.path.abspath(self.root), self.decode_size)
+
+    @staticmethod
+    def path_for(root: str, directory: str = None) -> str:
+        """Journal file of a scan root, next to its snapshot."""
+        return os.path.splitext(ScanSnapshot.path_for(root, directory))[0] + '.checkpoint'
+
+    @staticmethod
+    def exists(root: str, directory: str = None) -> bool:
+        return os.path.exists(ScanCheckpoint.path_for(root, directory))
+
+    def start(self):
+        """
+        Starts a new journal, replacing any previous one. If it cannot be
+        written the scan runs without a checkpoint.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            self.file = open(self.file_path, 'wb')
+            self._write(self._header())
+        except OSError as e:
+            print(f"Failed to start scan checkpoint: {e}")
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            return
+        self.flush()
+
+    @staticmethod
+    def resume(root: str, directory: str = None, decode_size: int = None) -> Optional['ScanCheckpoint']:
+        """
+        Loads the journal of root and reopens it for appending.
+
+        Returns:
+            The checkpoint, or None if there is no usable journal.
+        """
+        checkpoint = ScanCheckpoint(root, directory, decode_size=decode_size)
+        try:
+            with open(checkpoint.file_path, 'rb') as f:
+                header = pickle.load(f)
+                if header != checkpoint._header():
+                    return None
+                valid_end = f.tell()
+                while True:
+                    try:
+                        entry = pickle.load(f)
+                    except EOFError:
+                        break
+                    except Exception:
+                        print("Warning: Dropping incomplete checkpoint entry")
+                        break
+                    checkpoint._apply(entry)
+                    valid_end = f.tell()
+            # Append after the last complete entry
+            checkpoint.file = open(checkpoint.file_path, 'r+b')
+            checkpoint.file.truncate(valid_end)
+            checkpoint.file.seek(valid_end)
+            return checkpoint
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Failed to load scan checkpoint: {e}")
+            return None
+
+    def _apply(self, entry: Tuple):
+        kind = entry[0]
+        if kind == 'listing':
+            self.listings[os.path.abspath(entry[1])] = (entry[2], entry[3])
+        elif kind == 'features':
+            for path, hash_value, blur_score, *size in entry[1]:
+                # Journals written before sizes were recorded have none
+                width, height = size or (0, 0)
+                self.features[path] = (hash_value, blur_score, width, height)
+
+    def _write(self, entry: Tuple):
+        pickle.dump(entry, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def add_listing(self, directory: str, files: List[FileRecord], subdirs: List[str]):
+        """Listing callback for Scanner.stream_files."""
+        with self.lock:
+            self.listings[os.path.abspath(directory)] = (files, subdirs)
+            if self.file is not None:
+                try:
+                    self._write(('listing', directory, files, subdirs))
+                except OSError as e:
+                    print(f"Failed to write scan checkpoint: {e}")
+
+    def add_features(self, file_path: str, hash_value: Optional[int], blur_score: float,
+                     width: int = 0, height: int = 0):
+        with self.lock:
+            self.features[file_path] = (hash_value, blur_score, width, height)
+            self.pending_features.append((file_path, hash_value, blur_score, width, height))
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        if self.file is None:
+            return
+        try:
+            if self.pending_features:
+                self._write(('features', self.pending_features))
+                self.pending_features = []
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError as e:
+            print(f"Failed to write scan checkpoint: {e}")
+
+    def flush(self):
+        """Makes everything recorded so far durable."""
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        """Flushes and closes the journal, keeping it for a later resume."""
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        """Deletes the journal once the scan has completed."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        try:
+            os.remove(self.file_path)
+        except OSError:
+            pass
+
+    def records(self) -> List[FileRecord]:
+        """Every file found by the listings recorded so far."""
+        return [record for files, _ in self.listings.values() for record in files]
+
+    def frontier(self) -> List[str]:
+        """Directories found but not listed yet, where the walk resumes."""
+        if os.path.abspath(self.root) not in self.listings:
+            return [self.root]
+        return [subdir for _, subdirs in self.listings.values()
+                for subdir in subdirs if os.path.abspath(subdir) not in self.listings]
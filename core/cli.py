@@ -0,0 +1,156 @@
+"""
+Headless scanner: python -m core FOLDER [options]
+
+Scans a folder without the GUI and reports groups of duplicate, similar
+and blurry images together with the keep/delete decision of the rule
+engine. Nothing is moved or deleted. Defaults come from the GUI settings
+file, so both share the cache and scan options.
+
+Only the standard library is imported until the arguments are parsed,
+and Qt is never imported, so the command starts quickly on servers.
+"""
+import os
+import sys
+import json
+import signal
+import argparse
+import contextlib
+from typing import Dict, List, Any
+from .settings import Settings
+
+FORMATS = ('text', 'json', 'jsonl', 'csv')
+EXIT_STOPPED = 130  # as for a shell command interrupted by SIGINT
+EXIT_FAILED = 1
+
+
+def build_parser(settings: Settings) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m core',
+                                     description="重複・類似・ブレ画像をGUIなしで検出します (ファイルは変更しません)。")
+    parser.add_argument('folder', help="スキャンするフォルダ")
+    parser.add_argument('-w', '--workers', type=int, default=settings.get('scan_workers'),
+                        help="特徴量抽出のプロセス数 (既定: CPUコア数)")
+    parser.add_argument('--walker-threads', type=int, default=settings.get('walker_threads', 8),
+                        help="フォルダ走査のスレッド数 (1 = 逐次)")
+    parser.add_argument('-t', '--threshold', type=int, default=5,
+                        help="類似と判定するハッシュ距離 (既定: 5)")
+    parser.add_argument('--blur-threshold', type=float, default=settings.get('blur_threshold', 50.0),
+                        help="これ未満のスコアをブレ画像とする (既定: 設定ファイルの値)")
+    parser.add_argument('--decode-size', type=int, default=settings.get('decode_target_size'),
+                        help="縮小デコードのサイズ (0 = 原寸。既定は原寸、縮小するとブレスコアは近似値)")
+    parser.add_argument('--cache', default=settings.get('cache_path'),
+                        help="キャッシュファイルのパス (既定: ホームディレクトリの共有キャッシュ)")
+    parser.add_argument('--content-fallback', action='store_true',
+                        default=settings.get('cache_content_fallback', False),
+                        help="移動・改名されたファイルを内容ハッシュでキャッシュから探す")
+    parser.add_argument('--incremental', action='store_true',
+                        default=settings.get('incremental_scan', False),
+                        help="前回のスキャン結果との差分だけを処理する")
+    parser.add_argument('--resume', action='store_true',
+                        help="中断したスキャンを続きから再開する")
+    parser.add_argument('--no-rules', action='store_true',
+                        help="keep/delete の判定を行わない")
+    parser.add_argument('-f', '--format', choices=FORMATS, default='text',
+                        help="出力形式 (既定: text)。jsonl/csv は解像度・サイズ・ハッシュを含み、GUIで読み込めます")
+    parser.add_argument('-o', '--output', help="出力ファイル (既定: 標準出力)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="進捗を表示しない")
+    return parser
+
+
+def decide_actions(results: Dict[str, Any], apply_rules: bool = True) -> Dict[str, str]:
+    """
+    Default actions, as the GUI shows them after a scan: blurry images are
+    deleted, and in each group the rule engine keeps the best image.
+    """
+    from .rule_engine import RuleEngine
+    actions = {path: 'delete' for path, _ in results['blurry']}
+    if apply_rules:
+        for group in results['groups']:
+            actions.update(RuleEngine.apply_rules(group, blur_scores=results['blur_scores']))
+    return actions
+
+
+def write_text(out, results: Dict[str, Any], actions: Dict[str, str]):
+    from .report import report_groups
+    labels = {'blurry': "ブレ画像", 'duplicate': "重複・類似"}
+    groups = list(report_groups(results))
+    for number, (kind, paths) in enumerate(groups, 1):
+        out.write(f"グループ {number} ({labels[kind]}, {len(paths)} ファイル)\n")
+        for path in paths:
+            out.write(f"  {actions.get(path, '-'):<7}{path}\n")
+    deleted = sum(1 for action in actions.values() if action == 'delete')
+    out.write(f"{results['total_files']} ファイル中 {len(groups)} グループ, 削除候補 {deleted} ファイル\n")
+
+
+def write_json(out, results: Dict[str, Any], actions: Dict[str, str]):
+    from .report import report_groups
+    scores = results['blur_scores']
+    data = {
+        'total_files': results['total_files'],
+        'groups': [{'type': kind,
+                    'files': [{'path': path, 'action': actions.get(path), 'blur_score': scores.get(path)}
+                              for path in paths]}
+                   for kind, paths in report_groups(results)],
+    }
+    json.dump(data, out, ensure_ascii=False, indent=2)
+    out.write("\n")
+
+
+WRITERS = {'text': write_text, 'json': write_json}
+
+
+def main(argv: List[str] = None) -> int:
+    settings = Settings()
+    args = build_parser(settings).parse_args(argv)
+    if not os.path.isdir(args.folder):
+        print(f"フォルダが見つかりません: {args.folder}", file=sys.stderr)
+        return 2
+
+    from .pipeline import ScanPipeline
+    pipeline = ScanPipeline(args.folder, cache_path=args.cache, content_fallback=args.content_fallback,
+                            workers=args.workers, decode_size=args.decode_size or None,
+                            walker_threads=args.walker_threads, incremental=args.incremental,
+                            resume=args.resume, threshold=args.threshold,
+                            blur_threshold=args.blur_threshold)
+
+    def status(text):
+        if not args.quiet:
+            print(text, file=sys.stderr)
+
+    def progress_detail(path, processed, found, elapsed, total_known):
+        if not args.quiet and sys.stderr.isatty():
+            suffix = "" if total_known else " (検索中...)"
+            sys.stderr.write(f"\r{processed} / {found} ファイル{suffix}\033[K")
+            sys.stderr.flush()
+
+    # Ctrl+C stops at the next file and keeps the checkpoint for --resume
+    previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: pipeline.stop())
+    try:
+        # Warnings of the core modules go to stderr, keeping the report parseable
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                results = pipeline.run(progress_detail=progress_detail, status=status)
+            except Exception as e:
+                print(f"\nスキャンに失敗しました: {e} (--resume で続きから再開できます)", file=sys.stderr)
+                return EXIT_FAILED
+            if not args.quiet and sys.stderr.isatty():
+                sys.stderr.write("\n")
+            if results is None:
+                print("スキャンを中断しました (--resume で続きから再開できます)", file=sys.stderr)
+                return EXIT_STOPPED
+            actions = decide_actions(results, apply_rules=not args.no_rules)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+    def write(out):
+        if args.format in WRITERS:
+            WRITERS[args.format](out, results, actions)
+        else:
+            from .report import ReportWriter
+            ReportWriter.write_results(out, results, actions, args.format, os.path.abspath(args.folder))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as out:
+            write(out)
+    else:
+        write(sys.stdout)
+    return 0
@@ -0,0 +1,107 @@
+import os
+import hashlib
+from typing import List, Callable, Optional
+
+try:
+    import xxhash
+except ImportError:  # optional, BLAKE2 is used instead
+    xxhash = None
+
+class ExactDuplicateFinder:
+    """
+    Content hashes for finding byte-identical files without decoding them:
+    a hash of the first and last PARTIAL_SIZE bytes, and one of the whole
+    file for files that still collide (see StreamingDuplicateFinder).
+    """
+    PARTIAL_SIZE = 64 * 1024
+    CHUNK_SIZE = 1024 * 1024
+
+    @staticmethod
+    def _new_hasher():
+        if xxhash is not None:
+            return xxhash.xxh3_128()
+        return hashlib.blake2b(digest_size=16)
+
+    @staticmethod
+    def partial_hash(file_path: str, size: int) -> str:
+        """Hashes the first and last PARTIAL_SIZE bytes of a file."""
+        hasher = ExactDuplicateFinder._new_hasher()
+        with open(file_path, 'rb') as f:
+            hasher.update(f.read(ExactDuplicateFinder.PARTIAL_SIZE))
+            if size > 2 * ExactDuplicateFinder.PARTIAL_SIZE:
+                f.seek(-ExactDuplicateFinder.PARTIAL_SIZE, os.SEEK_END)
+                hasher.update(f.read(ExactDuplicateFinder.PARTIAL_SIZE))
+            elif size > ExactDuplicateFinder.PARTIAL_SIZE:
+                hasher.update(f.read())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def full_hash(file_path: str) -> str:
+        """Hashes the whole file content."""
+        hasher = ExactDuplicateFinder._new_hasher()
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(ExactDuplicateFinder.CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+
+class StreamingDuplicateFinder:
+    """
+    Groups byte-identical files that arrive one by one, with ExactDuplicateFinder's hashes.
+
+    Each file is keyed by size, then partial hash, then full hash, but a
+    deeper key is only computed once a second file shares the shallower
+    one, so a file with a unique size is never read. The earliest file
+    with given content is its representative.
+    """
+    _EXPANDED = object()  # bucket whose files have been moved one level deeper
+
+    def __init__(self):
+        self.buckets = {}  # key tuple -> first path, or _EXPANDED
+        self.copies = {}  # representative -> [representative, copies...]
+
+    def _levels(self, size: int) -> List[Callable[[str], str]]:
+        levels = [lambda p: ExactDuplicateFinder.partial_hash(p, size)]
+        if size > 2 * ExactDuplicateFinder.PARTIAL_SIZE:
+            levels.append(ExactDuplicateFinder.full_hash)
+        return levels
+
+    def add(self, file_path: str, size: int) -> Optional[str]:
+        """
+        Registers a file.
+
+        Returns:
+            The representative path if the file is a byte-identical copy of
+            a file added earlier, otherwise None.
+        """
+        if size <= 0:
+            return None
+        levels = self._levels(size)
+        key = (size,)
+        try:
+            for depth in range(len(levels) + 1):
+                holder = self.buckets.get(key)
+                if holder is None:
+                    self.buckets[key] = file_path
+                    return None
+                if depth == len(levels):
+                    self.copies.setdefault(holder, [holder]).append(file_path)
+                    return holder
+                if holder is not self._EXPANDED:
+                    # Second file with this key: move the first one down a level
+                    self.buckets[key] = self._EXPANDED
+                    try:
+                        self.buckets[key + (levels[depth](holder),)] = holder
+                    except (OSError, IOError) as e:
+                        print(f"Warning: Could not read file {holder}: {e}")
+                key = key + (levels[depth](file_path),)
+        except (OSError, IOError) as e:
+            print(f"Warning: Could not read file {file_path}: {e}")
+        return None
+
+    def groups(self) -> List[List[str]]:
+        """Groups found so far, each starting with its representative."""
+        return [list(group) for group in self.copies.values()]
@@ -0,0 +1,96 @@
+import io
+from typing import Dict, Any, Tuple
+import cv2
+import numpy as np
+import imagehash
+from PIL import Image
+from .blur_detector import BlurDetector
+
+class FeatureExtractor:
+    """
+    Computes every per-image feature from a single read and decode.
+
+    The file is read once, decoded once to an 8-bit grayscale buffer, and
+    the blur score, perceptual hashes, resolution and brightness are all
+    derived from that buffer. With a target_size the buffer is decoded at
+    1/2, 1/4 or 1/8 scale (JPEG DCT scaling) and the blur score is
+    normalised back to the full-resolution scale.
+    """
+    HASH_FUNCTIONS = {
+        'phash': imagehash.phash,
+        'dhash': imagehash.dhash,
+        'ahash': imagehash.average_hash,
+    }
+
+    @staticmethod
+    def decode_gray(data: bytes, target_size: int = None) -> Tuple[Image.Image, Tuple[int, int], int]:
+        """
+        Decodes image bytes to a grayscale ('L') image.
+
+        Args:
+            data: Encoded image.
+            target_size: Optional minimum longest side of the decoded buffer.
+
+        Returns:
+            (gray_image, (width, height), factor) where the size is the
+            original one and factor is the reduction that was applied.
+        """
+        img = Image.open(io.BytesIO(data))
+        width, height = img.size
+        factor = BlurDetector.reduction_factor(width, height, target_size)
+        if img.format == 'JPEG':
+            # Let libjpeg output (scaled) luminance directly
+            img.draft('L', (-(-width // factor), -(-height // factor)))
+            gray = img.convert('L')
+            factor = max(1, round(width / gray.width))
+        else:
+            gray = img.convert('L')
+            if factor > 1:
+                gray = gray.reduce(factor)
+        return gray, (width, height), factor
+
+    @staticmethod
+    def extract(image_path: str, hash_methods: Tuple[str, ...] = ('phash',),
+                target_size: int = None) -> Dict[str, Any]:
+        """
+        Extracts features of an image.
+
+        Args:
+            image_path: Image file.
+            hash_methods: Hashes to compute ('phash', 'dhash', 'ahash').
+            target_size: Decode at reduced resolution, keeping the longest
+                         side at least this many pixels. None = full size.
+
+        Returns:
+            Dict with 'blur_score', 'width', 'height', 'brightness' (0-255)
+            and one entry per hash method. 'hash' is the first method's hash.
+            On failure the hashes are None and the blur score is 0.
+        """
+        features = {'hash': None, 'blur_score': 0.0, 'width': 0, 'height': 0, 'brightness': 0.0}
+        try:
+            with open(image_path, "rb") as f:
+                data = f.read()
+            gray_image, (width, height), factor = FeatureExtractor.decode_gray(data, target_size)
+        except (OSError, IOError) as e:
+            print(f"Warning: Could not read file {image_path}: {e}")
+            return features
+        except Exception as e:
+            print(f"Warning: Could not decode image {image_path}: {e}")
+            return features
+
+        try:
+            gray = np.asarray(gray_image)
+            features['width'] = width
+            features['height'] = height
+            features['brightness'] = float(gray.mean())
+            score = cv2.Laplacian(gray, cv2.CV_64F).var()
+            features['blur_score'] = float(BlurDetector.normalize_score(score, factor))
+
+            for method in hash_methods:
+                hash_function = FeatureExtractor.HASH_FUNCTIONS.get(method, imagehash.phash)
+                features[method] = hash_function(gray_image)
+            if hash_methods:
+                features['hash'] = features[hash_methods[0]]
+        except Exception as e:
+            print(f"Unexpected error processing {image_path}: {e}")
+        return features
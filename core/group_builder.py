@@ -1,29 +1,79 @@
 from typing import List, Dict, Tuple
 import imagehash
+from .hash_engine import HashEngine
+from .similarity_index import (SimilarityIndex, MultiIndexHash, MappedMultiIndex, create_index,
+                               hamming_distance, pack_hashes, popcount64)
+
+class UnionFind:
+    """Disjoint-set forest with path halving and union by size."""
+    
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+        
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+        
+    def union(self, a: int, b: int) -> int:
+        """Merges the sets of a and b and returns the new root."""
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
 
 class GroupBuilder:
     @staticmethod
-    def build_groups(image_hashes: List[Tuple[str, imagehash.ImageHash]], threshold: int = 5) -> List[List[str]]:
+    def build_groups(image_hashes: List[Tuple[str, imagehash.ImageHash]], threshold: int = 5,
+                     engine: str = 'mih', mode: str = 'greedy', max_diameter: int = None) -> List[List[str]]:
         """
         Groups images based on hash distance.
-        This is a naive O(N^2) implementation for MVP.
+        
+        In 'greedy' mode each ungrouped image in input order becomes a seed
+        and collects every other ungrouped image within the threshold.
+        In 'union_find' mode every pair within the threshold is linked and
+        groups are the connected components, so the result does not depend
+        on input order and near-duplicate chains stay together.
         
         Args:
             image_hashes: List of (path, hash) tuples.
             threshold: Hamming distance threshold.
+            engine: Similarity index to use ('mih', 'bktree', 'numpy' or 'linear').
+            mode: 'greedy' or 'union_find'.
+            max_diameter: union_find only. If set, two groups are only merged
+                          when every pair across them stays within this distance.
             
         Returns:
             List of groups, where each group is a list of file paths.
             Only returns groups with size > 1.
         """
+        if mode == 'union_find':
+            return GroupBuilder._build_union_find(image_hashes, threshold, engine, max_diameter)
+        if mode != 'greedy':
+            raise ValueError(f"Unknown grouping mode: {mode}")
+        
         groups = []
         visited = set()
         
         # Filter out None hashes
         valid_hashes = [item for item in image_hashes if item[1] is not None]
+        if not valid_hashes:
+            return groups
+        
+        values = [HashEngine.hash_to_int(h) for _, h in valid_hashes]
+        index = create_index(engine, HashEngine.hash_bits(valid_hashes[0][1]), len(values))
+        index.add_all(values)
         
         for i in range(len(valid_hashes)):
-            path_i, hash_i = valid_hashes[i]
+            path_i = valid_hashes[i][0]
             
             if path_i in visited:
                 continue
@@ -31,19 +81,295 @@ class GroupBuilder:
             current_group = [path_i]
             visited.add(path_i)
             
-            for j in range(i + 1, len(valid_hashes)):
-                path_j, hash_j = valid_hashes[j]
+            # Every index before i is already visited, so sorting the
+            # neighbours reproduces the order of the pairwise scan.
+            neighbours = sorted(j for j, _ in index.query(values[i], threshold))
+            for j in neighbours:
+                path_j = valid_hashes[j][0]
                 
                 if path_j in visited:
                     continue
                 
-                # Calculate distance
-                dist = hash_i - hash_j
-                if dist <= threshold:
-                    current_group.append(path_j)
-                    visited.add(path_j)
+                current_group.append(path_j)
+                visited.add(path_j)
             
             if len(current_group) > 1:
                 groups.append(current_group)
                 
         return groups
+    
+    @staticmethod
+    def _build_union_find(image_hashes, threshold, engine, max_diameter) -> List[List[str]]:
+        # Sort by path so ids (and therefore the output) ignore input order
+        by_path = {}
+        for path, h in image_hashes:
+            if h is not None and path not in by_path:
+                by_path[path] = h
+        if not by_path:
+            return []
+        paths = sorted(by_path)
+        
+        bits = HashEngine.hash_bits(by_path[paths[0]])
+        values = [HashEngine.hash_to_int(by_path[p]) for p in paths]
+        index = create_index(engine, bits, len(values))
+        index.add_all(values)
+        
+        uf = UnionFind(len(paths))
+        if max_diameter is None:
+            for i, j, _ in index.pairs(threshold):
+                uf.union(i, j)
+        else:
+            GroupBuilder._union_with_diameter(uf, index.pairs(threshold), values, bits, max_diameter)
+        
+        components = {}
+        for i in range(len(paths)):
+            components.setdefault(uf.find(i), []).append(i)
+        
+        # Members are already in path order; order groups by their first path
+        groups = [[paths[i] for i in members] for members in components.values() if len(members) > 1]
+        groups.sort(key=lambda g: g[0])
+        return groups
+    
+    @staticmethod
+    def _union_with_diameter(uf: UnionFind, pairs, values: List[int], bits: int, max_diameter: int):
+        """
+        Complete-linkage style merging: closest pairs first, and a merge is
+        refused if it would put two members further apart than max_diameter.
+        """
+        packed = pack_hashes(values) if bits <= 64 else None
+        members = {}  # root -> member ids
+        
+        for dist, i, j in sorted((d, i, j) for i, j, d in pairs):
+            if dist > max_diameter:
+                break
+            root_i = uf.find(i)
+            root_j = uf.find(j)
+            if root_i == root_j:
+                continue
+            
+            left = members.get(root_i, [root_i])
+            right = members.get(root_j, [root_j])
+            if len(left) > 1 or len(right) > 1:
+                if packed is not None:
+                    cross = popcount64(packed[left][:, None] ^ packed[right][None, :])
+                    widest = int(cross.max())
+                else:
+                    widest = max(hamming_distance(values[a], values[b]) for a in left for b in right)
+                if widest > max_diameter:
+                    continue
+            
+            root = uf.union(root_i, root_j)
+            members.pop(root_i, None)
+            members.pop(root_j, None)
+            members[root] = left + right
+    
+    @staticmethod
+    def merge_exact_duplicates(groups: List[List[str]], exact_groups: List[List[str]],
+                               order: Dict[str, int] = None) -> List[List[str]]:
+        """
+        Adds byte-identical copies back into similarity groups.
+        
+        Args:
+            groups: Groups built from one representative per exact group.
+            exact_groups: Groups from StreamingDuplicateFinder; the first path
+                          of each is the representative that was hashed.
+            order: Optional path -> position of the grouped input. Members
+                   and groups are then sorted by it, as if the copies had
+                   been grouped by hash like every other file.
+            
+        Returns:
+            Groups with copies listed right after their representative, or
+            in order. Exact groups whose representative matched nothing
+            else are groups of their own (appended without order).
+        """
+        copies = {group[0]: group[1:] for group in exact_groups}
+        merged = []
+        placed = set()
+        for group in groups:
+            expanded = []
+            for path in group:
+                expanded.append(path)
+                if path in copies:
+                    expanded.extend(copies[path])
+                    placed.add(path)
+            merged.append(expanded)
+            
+        for group in exact_groups:
+            if group[0] not in placed:
+                merged.append(list(group))
+        if order is not None:
+            for group in merged:
+                group.sort(key=order.get)
+            merged.sort(key=lambda g: order[g[0]])
+        return merged
+
+class IncrementalGrouper:
+    """
+    Connected-component grouping that can be patched in place.
+    
+    Produces the same groups as GroupBuilder.build_groups(mode='union_find')
+    without max_diameter, but files can be added and removed afterwards:
+    an addition merges the components of its neighbours, and a removal only
+    re-links the members of the component it left. Removed entries stay in
+    the similarity index as tombstones and are filtered from queries.
+    size_hint sizes the index for the number of files expected over its life.
+    """
+    
+    def __init__(self, threshold: int = 5, engine: str = 'mih', bits: int = 64, size_hint: int = 1 << 16,
+                 index: SimilarityIndex = None):
+        self.threshold = threshold
+        self.index = index if index is not None else create_index(engine, bits, size_hint)
+        self.paths = []  # id -> path, None once removed
+        self.ids = {}  # path -> id
+        self.label = []  # id -> component label
+        self.members = {}  # label -> set of ids, only for components of two or more
+        self.dirty = set()  # labels that lost members since the last refresh
+        
+    def __len__(self):
+        return len(self.ids)
+    
+    def __contains__(self, path: str) -> bool:
+        return path in self.ids
+    
+    def _append(self, path: str, value: int) -> int:
+        item_id = self.index.add(value)
+        self.paths.append(path)
+        self.ids[path] = item_id
+        self.label.append(item_id)
+        return item_id
+    
+    def _merge(self, a: int, b: int) -> int:
+        """Merges two components, relabelling the smaller one."""
+        if a == b:
+            return a
+        members_a = self.members.get(a) or {a}
+        members_b = self.members.get(b) or {b}
+        if len(members_a) < len(members_b):
+            a, b = b, a
+            members_a, members_b = members_b, members_a
+        self.members.pop(b, None)
+        for item_id in members_b:
+            self.label[item_id] = a
+        members_a |= members_b
+        self.members[a] = members_a
+        if b in self.dirty:
+            self.dirty.discard(b)
+            self.dirty.add(a)
+        return a
+    
+    def _neighbours(self, item_id: int) -> List[int]:
+        paths = self.paths
+        return [j for j, _ in self.index.query(self.index.values[item_id], self.threshold)
+                if j != item_id and paths[j] is not None]
+    
+    def add(self, path: str, hash_value):
+        """Adds (or replaces) a file. Files without a hash are ignored."""
+        if path in self.ids:
+            self.remove(path)
+        if hash_value is None:
+            return
+        item_id = self._append(path, HashEngine.hash_to_int(hash_value))
+        label = item_id
+        for j in self._neighbours(item_id):
+            label = self._merge(label, self.label[j])
+    
+    def remove(self, path: str):
+        """Removes a file; its component is split lazily by refresh()."""
+        item_id = self.ids.pop(path, None)
+        if item_id is None:
+            return
+        self.paths[item_id] = None
+        label = self.label[item_id]
+        members = self.members.get(label)
+        if members is None:
+            return
+        members.discard(item_id)
+        self.dirty.add(label)
+    
+    def _set_groups(self, groups: List[List[str]]):
+        for group in groups:
+            ids = [self.ids[path] for path in group if path in self.ids]
+            if len(ids) > 1:
+                label = min(ids)
+                for item_id in ids:
+                    self.label[item_id] = label
+                self.members[label] = set(ids)
+    
+    def restore(self, hashes: Dict[str, int], groups: List[List[str]]):
+        """
+        Loads a previously computed state without querying the index.
+        
+        Args:
+            hashes: path -> integer hash of every file.
+            groups: The groups returned by groups() for those hashes.
+        """
+        for path in sorted(hashes):
+            if hashes[path] is not None:
+                self._append(path, hashes[path])
+        self._set_groups(groups)
+    
+    @staticmethod
+    def load(index_file: str, meta: Dict, paths: List[str], groups: List[List[str]],
+             threshold: int = 5) -> 'IncrementalGrouper':
+        """
+        Opens a state written by save_index(). The index is memory-mapped,
+        so nothing is re-inserted.
+        
+        Returns:
+            The grouper, or None if the index file does not match meta.
+        """
+        index = MappedMultiIndex.load(index_file, meta)
+        if index is None or len(index) != len(paths):
+            return None
+        grouper = IncrementalGrouper(threshold, index=index)
+        grouper.paths = list(paths)
+        grouper.ids = {path: i for i, path in enumerate(paths)}
+        grouper.label = list(range(len(paths)))
+        grouper._set_groups(groups)
+        return grouper
+    
+    def save_index(self, index_file: str) -> Tuple[List[str], Dict]:
+        """
+        Writes the live entries, compacted and in path order, as a
+        MappedMultiIndex.
+        
+        Returns:
+            (paths in index order, index metadata) to keep with the groups.
+        """
+        paths = sorted(self.ids)
+        values = [self.index.values[self.ids[path]] for path in paths]
+        meta = MappedMultiIndex.write(index_file, values, self.index.bits,
+                                      MultiIndexHash.bands_for(len(values), self.index.bits))
+        return paths, meta
+    
+    def refresh(self):
+        """Splits components that lost members into their connected parts."""
+        for label in list(self.dirty):
+            remaining = self.members.pop(label, None)
+            if not remaining:
+                continue
+            unvisited = set(remaining)
+            while unvisited:
+                start = unvisited.pop()
+                component = {start}
+                stack = [start]
+                while stack:
+                    for j in self._neighbours(stack.pop()):
+                        if j in unvisited:
+                            unvisited.discard(j)
+                            component.add(j)
+                            stack.append(j)
+                new_label = min(component)
+                for item_id in component:
+                    self.label[item_id] = new_label
+                if len(component) > 1:
+                    self.members[new_label] = component
+        self.dirty.clear()
+    
+    def groups(self) -> List[List[str]]:
+        """Current groups with size > 1, in the order build_groups returns them."""
+        self.refresh()
+        groups = [sorted(self.paths[i] for i in members)
+                  for members in self.members.values() if len(members) > 1]
+        groups.sort(key=lambda g: g[0])
+        return groups
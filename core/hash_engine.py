@@ -4,12 +4,23 @@ import os
 
 class HashEngine:
     @staticmethod
-    def compute_hash(image_path: str, method: str = 'phash') -> imagehash.ImageHash:
+    def compute_hash(image_path: str, method: str = 'phash', target_size: int = None) -> imagehash.ImageHash:
         """
         Computes the perceptual hash of an image.
+        
+        Args:
+            image_path: Image file.
+            method: 'phash', 'ahash' or 'dhash'.
+            target_size: If set, JPEGs are decoded at a reduced scale (DCT
+                         scaling via Image.draft) whose longest side is still
+                         at least this many pixels. Hashes only need 32x32.
         """
         try:
             img = Image.open(image_path)
+            if target_size and img.format == 'JPEG':
+                scale = max(img.size) / target_size
+                if scale > 1:
+                    img.draft('L', (int(img.width / scale), int(img.height / scale)))
             if method == 'phash':
                 return imagehash.phash(img)
             elif method == 'ahash':
@@ -21,3 +32,26 @@ class HashEngine:
         except Exception as e:
             print(f"Error hashing {image_path}: {e}")
             return None
+
+    @staticmethod
+    def hash_to_int(hash_value) -> int:
+        """
+        Converts an ImageHash to an integer with the same bit layout,
+        so that popcount(a ^ b) equals the ImageHash distance.
+        Integers are passed through unchanged.
+        """
+        if isinstance(hash_value, int):
+            return hash_value
+        return int(str(hash_value), 16)
+
+    @staticmethod
+    def int_to_hash(value: int, bits: int = 64) -> imagehash.ImageHash:
+        """Converts an integer produced by hash_to_int back to an ImageHash."""
+        return imagehash.hex_to_hash(format(value, f'0{bits // 4}x'))
+
+    @staticmethod
+    def hash_bits(hash_value) -> int:
+        """Returns the number of bits in a hash (64 for integers)."""
+        if isinstance(hash_value, int):
+            return 64
+        return hash_value.hash.size
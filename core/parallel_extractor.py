@@ -0,0 +1,110 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Tuple, Dict, Any, Callable, Iterator, Iterable
+from .scanner import Scanner
+from .feature_extractor import FeatureExtractor
+from .video_hash import VideoHash
+
+
+def extract_features(file_path: str, target_size: int = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Computes (path, features) for one file, see FeatureExtractor.extract.
+    Videos only get 'hash' and a blur score of 0.
+    Module-level so it can run in worker processes.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in Scanner.VIDEO_EXTENSIONS:
+        return file_path, {'hash': VideoHash.compute_hash(file_path), 'blur_score': 0}
+    return file_path, FeatureExtractor.extract(file_path, target_size=target_size)
+
+
+def _extract_chunk(paths: List[str], target_size: int = None) -> List[Tuple[str, Dict[str, Any]]]:
+    return [extract_features(p, target_size) for p in paths]
+
+
+class ParallelExtractor:
+    """
+    Runs extract_features over many files in a process pool.
+
+    Files are submitted in chunks to amortise inter-process overhead, and
+    only a bounded number of chunks is in flight so results stream back
+    while the rest of the list waits.
+    """
+
+    def __init__(self, workers: int = None, chunk_size: int = 8, ordered: bool = False,
+                 target_size: int = None):
+        """
+        Args:
+            workers: Number of processes. None or 0 uses every core;
+                     1 runs in the calling thread without a pool.
+            chunk_size: Files per submitted job.
+            ordered: Yield results in input order instead of completion order.
+            target_size: Reduced decode size passed to FeatureExtractor.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.ordered = ordered
+        self.target_size = target_size
+
+    def run(self, paths: Iterable[str],
+            should_stop: Callable[[], bool] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yields (path, features) for each file.
+
+        should_stop is polled between results; once it returns True
+        queued jobs are cancelled and the generator ends.
+        """
+        should_stop = should_stop or (lambda: False)
+
+        if self.workers == 1:
+            for path in paths:
+                if should_stop():
+                    return
+                yield extract_features(path, self.target_size)
+            return
+
+        chunks = self._chunks(paths)
+        max_in_flight = self.workers * 2
+        # Workers are spawned, not forked: the pool starts while walker threads
+        # run, and a fork could copy a lock one of them holds (e.g. stdout's)
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            in_flight = deque()
+            exhausted = False
+            while True:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                    else:
+                        in_flight.append(executor.submit(_extract_chunk, chunk, self.target_size))
+                if not in_flight:
+                    return
+
+                # Wake up periodically so a stop request is honoured promptly
+                targets = [in_flight[0]] if self.ordered else list(in_flight)
+                done, _ = wait(targets, timeout=0.2, return_when=FIRST_COMPLETED)
+                if should_stop():
+                    return
+                for future in (targets if self.ordered else done):
+                    if not future.done():
+                        break
+                    in_flight.remove(future)
+                    for result in future.result():
+                        yield result
+                        if should_stop():
+                            return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _chunks(self, paths: Iterable[str]) -> Iterator[List[str]]:
+        chunk = []
+        for path in paths:
+            chunk.append(path)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
@@ -0,0 +1,370 @@
+import os
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Optional
+from .scanner import Scanner
+from .blur_detector import BlurDetector
+from .hash_engine import HashEngine
+from .group_builder import GroupBuilder, IncrementalGrouper
+from .snapshot import ScanSnapshot
+from .checkpoint import ScanCheckpoint
+from .cache import Cache
+from .exact_duplicates import ExactDuplicateFinder, StreamingDuplicateFinder
+from .parallel_extractor import ParallelExtractor
+from .thumbnail_cache import ThumbnailCache
+
+# (current file, processed, found, elapsed seconds, whether found is final)
+DetailCallback = Callable[[str, int, int, float, bool], None]
+
+
+class ScanPipeline:
+    """
+    One scan of a folder: walk, feature extraction, grouping.
+
+    Runs in the calling thread and reports through plain callbacks, so it
+    is shared by the GUI's ScanWorker and the command-line scanner.
+    """
+
+    def __init__(self, folder: str, cache_path: str = None, content_fallback: bool = False,
+                 workers: int = None, decode_size: int = None, walker_threads: int = 1,
+                 incremental: bool = False, resume: bool = False, threshold: int = 5,
+                 blur_threshold: float = 50.0, thumbnail_dir: str = None,
+                 thumbnail_cache_bytes: int = 512 * 1024 * 1024, snapshot_dir: str = None):
+        """
+        Args:
+            folder: Folder to scan.
+            cache_path: Feature cache database, None for the shared default.
+            content_fallback: Look up moved or renamed files by content hash.
+            workers: Extraction processes, None for one per CPU core.
+            decode_size: Reduced decode size, None for full resolution.
+            walker_threads: Directory listing threads, 1 = sequential.
+            incremental: Patch the previous scan's groups (union_find groups).
+            resume: Continue the interrupted scan of folder, if there is one.
+            threshold: Hamming distance threshold for similar images.
+            blur_threshold: Blur scores below this are reported as blurry.
+            thumbnail_dir: ThumbnailCache directory to fill with the thumbnails
+                           of the reported images, None to make no thumbnails.
+            thumbnail_cache_bytes: Byte budget of the thumbnail cache.
+            snapshot_dir: Directory of scan snapshots and checkpoints, None
+                          for ScanSnapshot.default_dir().
+        """
+        self.folder = folder
+        self.cache_path = cache_path
+        self.content_fallback = content_fallback
+        self.workers = workers
+        self.decode_size = decode_size
+        self.walker_threads = walker_threads
+        self.incremental = incremental
+        self.resume = resume
+        self.threshold = threshold
+        self.blur_threshold = blur_threshold
+        self.thumbnail_dir = thumbnail_dir
+        self.thumbnail_cache_bytes = thumbnail_cache_bytes
+        self.snapshot_dir = snapshot_dir
+        self._should_stop = False
+
+    def stop(self):
+        """Asks a running scan to stop; safe to call from another thread."""
+        self._should_stop = True
+
+    def run(self, progress: Callable[[int], None] = None, progress_detail: DetailCallback = None,
+            status: Callable[[str], None] = None) -> Optional[Dict[str, Any]]:
+        """
+        Scans the folder.
+
+        Args:
+            progress: Receives the overall progress in percent.
+            progress_detail: Receives per-file progress, see DetailCallback.
+            status: Receives a description of the current stage.
+
+        Returns:
+            {'blurry', 'groups', 'blur_scores', 'hashes', 'dimensions', 'file_sizes',
+            'total_files'}, or None if the scan was stopped. A stopped scan
+            keeps its checkpoint. hashes, dimensions (path -> (width, height),
+            where known) and file_sizes (path -> bytes) only cover the files
+            in blurry and groups.
+
+        Raises:
+            Whatever stopped feature extraction (a broken worker pool, a
+            failing cache write, ...). The checkpoint is kept as for a stop.
+        """
+        progress = progress or (lambda value: None)
+        progress_detail = progress_detail or (lambda *args: None)
+        status = status or (lambda text: None)
+        start_time = time.time()
+
+        # Load cache
+        cache = Cache(cache_path=self.cache_path or Cache.default_path(), decode_size=self.decode_size)
+        cache.load(self.folder)
+        snapshot = (ScanSnapshot.load(self.folder, threshold=self.threshold, directory=self.snapshot_dir,
+                                      decode_size=self.decode_size) if self.incremental else None)
+        thumbnails = ThumbnailCache(self.thumbnail_dir, self.thumbnail_cache_bytes) if self.thumbnail_dir else None
+
+        # Journal of this scan; a resumed scan continues the previous one
+        checkpoint = (ScanCheckpoint.resume(self.folder, self.snapshot_dir, decode_size=self.decode_size)
+                      if self.resume else None)
+        resumed = checkpoint is not None
+        if checkpoint is None:
+            checkpoint = ScanCheckpoint(self.folder, self.snapshot_dir, decode_size=self.decode_size)
+            checkpoint.start()
+
+        status("スキャンを再開中..." if resumed else "ファイルをスキャン・解析中...")
+        records = {}  # path -> FileRecord, in discovery order
+        matcher = StreamingDuplicateFinder()
+        copy_of = {}  # byte-identical copy -> representative, reuses its features
+        features = {}  # path -> (hash, blur_score)
+        dimensions = {}  # path -> (width, height), for images whose size is known
+        content_hashes = {}  # path -> content hash, when the fallback computed one
+        processed = 0
+        scanning = True  # the total is unknown until the walk ends
+
+        def report(path):
+            # Report progress less frequently for better performance
+            found = len(records)
+            if processed % 5 == 0 or processed == found:
+                elapsed = time.time() - start_time
+                progress_detail(path, processed, found, elapsed, not scanning)
+                if not scanning:
+                    progress(int((processed / found) * 50))
+
+        def record_features(path):
+            h, score = features[path]
+            checkpoint.add_features(path, HashEngine.hash_to_int(h) if h is not None else None, score,
+                                    *dimensions.get(path, (0, 0)))
+
+        def use_cached(path, cached):
+            features[path] = (cached.get('hash'), cached.get('blur_score', 0))
+            if cached.get('width'):
+                dimensions[path] = (cached['width'], cached['height'])
+
+        def pending():
+            """Walks the folder and yields the files that need extraction."""
+            nonlocal processed, scanning
+            # Files listed before the stop first, then the rest of the tree
+            walked = Scanner.stream_files(self.folder, workers=self.walker_threads,
+                                          on_listing=checkpoint.add_listing,
+                                          start_dirs=checkpoint.frontier() if resumed else None)
+            for record in itertools.chain(checkpoint.records() if resumed else [], walked):
+                if self._should_stop:
+                    return
+                f = record.path
+                records[f] = record
+                try:
+                    previous = snapshot.lookup(record) if snapshot is not None else None
+                    if previous is not None:
+                        features[f] = previous[:2]
+                        if previous[2]:
+                            dimensions[f] = previous[2:]
+                        processed += 1
+                        report(f)
+                        continue
+
+                    if f in checkpoint.features:
+                        h, score, width, height = checkpoint.features[f]
+                        features[f] = (HashEngine.int_to_hash(h) if h is not None else None, score)
+                        if width:
+                            dimensions[f] = (width, height)
+                        processed += 1
+                        report(f)
+                        continue
+
+                    # 1. Check cache by path, then by file identity. A hit never reads
+                    # the file, so cached copies are grouped by their equal hashes
+                    cached = cache.get(f, record.mtime, record)
+                    if cached:
+                        use_cached(f, cached)
+                        processed += 1
+                        report(f)
+                        continue
+
+                    # Copies of a file that is still to be extracted share its result
+                    representative = matcher.add(f, record.size)
+                    if representative is not None:
+                        copy_of[f] = representative
+                        continue
+
+                    # Then by content
+                    if self.content_fallback:
+                        try:
+                            content_hashes[f] = ExactDuplicateFinder.full_hash(f)
+                            cached = cache.get_by_content(f, content_hashes[f], record.mtime, record)
+                        except OSError:
+                            pass
+
+                    if cached:
+                        use_cached(f, cached)
+                        processed += 1
+                        report(f)
+                    else:
+                        yield f
+                except Exception as e:
+                    # Without a cached result the file is simply extracted
+                    print(f"Warning: Could not look up {f}, extracting it: {e}")
+                    yield f
+            scanning = False
+
+        # 2. Compute new values in worker processes while the walk continues
+        extractor = ParallelExtractor(workers=self.workers, target_size=self.decode_size)
+        to_compute = pending()
+        try:
+            for f, extracted in extractor.run(to_compute, lambda: self._should_stop):
+                h, score = extracted['hash'], extracted['blur_score']
+                features[f] = (h, score)
+                if extracted.get('width'):
+                    dimensions[f] = (extracted['width'], extracted['height'])
+                record_features(f)
+                record = records[f]
+                width, height = dimensions.get(f, (None, None))
+                cache.set(f, record.mtime, h, score, record.size, record, content_hashes.get(f),
+                          width=width, height=height)
+                processed += 1
+                report(f)
+        except Exception:
+            # Grouping what is left would silently miss files: fail like a
+            # stop, keeping the journal so that the scan can be resumed
+            to_compute.close()
+            cache.close()
+            if thumbnails is not None:
+                thumbnails.close()
+            checkpoint.close()
+            raise
+        finally:
+            to_compute.close()
+        scanning = False
+
+        # Discovery order depends on thread timing; group in a stable order
+        files = sorted(records, key=Scanner.path_sort_key)
+        total = len(files)
+        order = {path: i for i, path in enumerate(files)}
+        exact_groups = matcher.groups()
+
+        # 3. Exact copies: no need to decode. Cache hits never reach the matcher,
+        # so every copy here is missing from the cache
+        for f, representative in copy_of.items():
+            if self._should_stop:
+                break
+            if f in features or representative not in features:
+                continue
+            features[f] = features[representative]
+            if representative in dimensions:
+                dimensions[f] = dimensions[representative]
+            record = records[f]
+            width, height = dimensions.get(f, (None, None))
+            cache.set(f, record.mtime, *features[f], record.size, record, width=width, height=height)
+            processed += 1
+            report(f)
+
+        # Final cache save
+        cache.close()
+
+        if self._should_stop:
+            # Keep the journal so that the scan can be resumed
+            if thumbnails is not None:
+                thumbnails.close()
+            checkpoint.close()
+            return None
+
+        blurry_images = []
+        blur_scores = {}
+        hashes = []
+        for f in files:
+            if f not in features:
+                continue
+            h, score = features[f]
+            blur_scores[f] = score
+            is_video = os.path.splitext(f)[1].lower() in Scanner.VIDEO_EXTENSIONS
+            if not is_video and BlurDetector.is_blurry(score, self.blur_threshold):
+                blurry_images.append((f, score))
+            # Copies are added back after grouping
+            if f not in copy_of:
+                hashes.append((f, h))
+
+        status("画像をグループ化中...")
+        if self.incremental:
+            groups = self._group_incremental(snapshot, files, records, features, dimensions, status)
+        else:
+            groups = GroupBuilder.build_groups(hashes, threshold=self.threshold)
+            groups = GroupBuilder.merge_exact_duplicates(groups, exact_groups, order)
+
+        # Hashes and sizes of the reported files, for exported reports
+        reported = list(itertools.chain((f for f, _ in blurry_images), (f for group in groups for f in group)))
+        report_hashes = {f: features[f][0] for f in reported if f in features and features[f][0] is not None}
+        report_dimensions = {f: dimensions[f] for f in reported if f in dimensions}
+        file_sizes = {f: records[f].size for f in reported}
+
+        if thumbnails is not None:
+            self._make_thumbnails(thumbnails, reported, status)
+            thumbnails.close()
+
+        progress(100)
+        checkpoint.discard()
+        return {
+            'blurry': blurry_images,
+            'groups': groups,
+            'blur_scores': blur_scores,
+            'hashes': report_hashes,
+            'dimensions': report_dimensions,
+            'file_sizes': file_sizes,
+            'total_files': total
+        }
+
+    def _make_thumbnails(self, thumbnails: ThumbnailCache, paths: List[str], status: Callable[[str], None]):
+        """
+        Writes the thumbnail tiers of the reported images that have none yet,
+        so the grid opens at once. Only files the user will look at are
+        decoded again; the rest of the library gets no thumbnails.
+        """
+        images = [f for f in paths if os.path.splitext(f)[1].lower() not in Scanner.VIDEO_EXTENSIONS]
+        if not images:
+            return
+        status("サムネイルを作成中...")
+        # Decoding and encoding release the GIL, and fetch() is safe in threads
+        pool = ThreadPoolExecutor(max_workers=self.workers or os.cpu_count() or 1)
+        try:
+            futures = [pool.submit(ThumbnailCache.fetch, thumbnails.directory, f, ThumbnailCache.TIERS[0])
+                       for f in images]
+            for future in futures:
+                if self._should_stop:
+                    break
+                found = future.result()
+                if found is not None:
+                    thumbnails.record(found[1], found[2])
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _group_incremental(self, snapshot, files, records, features, dimensions, status) -> List[List[str]]:
+        """
+        Connected-component grouping that patches the previous scan's groups
+        with the added, removed and modified files, then saves a new snapshot
+        together with the similarity index.
+        """
+        if snapshot is None:
+            grouper = IncrementalGrouper(threshold=self.threshold, size_hint=len(files))
+            changed = [f for f in files if f in features]
+            snapshot = ScanSnapshot(self.folder, threshold=self.threshold, decode_size=self.decode_size)
+        else:
+            grouper = snapshot.open_grouper(size_hint=len(files), directory=self.snapshot_dir)
+            added, removed, modified = snapshot.diff()
+            status(f"変更を反映中... (追加 {len(added)} / 削除 {len(removed)} / 更新 {len(modified)})")
+            for f in removed:
+                grouper.remove(f)
+            changed = added + modified
+
+        for f in changed:
+            if f in features:
+                grouper.add(f, features[f][0])
+            else:
+                grouper.remove(f)
+        groups = grouper.groups()
+
+        rows = []
+        for f in files:
+            if f in features:
+                h, score = features[f]
+                value = HashEngine.hash_to_int(h) if h is not None else None
+                record = records[f]
+                rows.append((f, record.size, record.mtime_ns, value, score, *dimensions.get(f, (0, 0))))
+        snapshot.groups = groups
+        snapshot.save(rows, directory=self.snapshot_dir, grouper=grouper)
+        return groups
@@ -0,0 +1,175 @@
+import os
+import mmap
+import struct
+import hashlib
+from typing import Iterable, Iterator, Tuple, Optional
+import numpy as np
+import imagehash
+from .hash_engine import HashEngine
+from .atomic import atomic_write
+
+# (path, size, mtime_ns, hash as int or None, blur_score, width, height); 0 = unknown size
+Row = Tuple[str, int, int, Optional[int], float, int, int]
+
+
+class RecordTable:
+    """
+    Per-file scan records in a compact, memory-mapped columnar file.
+
+    Each record takes 53 bytes of fixed-width columns plus its UTF-8 path,
+    instead of a pickled tuple and ImageHash. Rows are sorted by a 64-bit
+    digest of the path, so a path is found by binary search without loading
+    every path into a dict.
+
+    File layout: a 32-byte header (magic, version, count, path bytes), then
+    the columns key, hash, size, mtime_ns (8 bytes each), the path offsets
+    (count + 1 x 8 bytes), blur (float32), width, height (uint32), flags
+    (uint8), and the paths.
+    """
+    MAGIC = b'DCRECS\0\0'
+    VERSION = 2
+    HEADER = struct.Struct('<8sIIQQ')  # magic, version, reserved, count, path bytes
+    HAS_HASH = 1
+
+    def __init__(self):
+        self.count = 0
+        self.key = np.empty(0, dtype='<u8')
+        self.hash = np.empty(0, dtype='<u8')
+        self.size = np.empty(0, dtype='<u8')
+        self.mtime_ns = np.empty(0, dtype='<i8')
+        self.offsets = np.zeros(1, dtype='<u8')
+        self.blur = np.empty(0, dtype='<f4')
+        self.width = np.empty(0, dtype='<u4')
+        self.height = np.empty(0, dtype='<u4')
+        self.flags = np.empty(0, dtype='u1')
+        self.path_bytes = np.empty(0, dtype='u1')
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def _encode(path: str) -> bytes:
+        return path.encode('utf-8', 'surrogateescape')
+
+    @staticmethod
+    def path_key(encoded_path: bytes) -> int:
+        """64-bit digest of an encoded path, used as the sort key."""
+        return int.from_bytes(hashlib.blake2b(encoded_path, digest_size=8).digest(), 'little')
+
+    @staticmethod
+    def write(file_path: str, rows: Iterable[Row]):
+        """Writes rows (in any order) to a record file."""
+        rows = list(rows)
+        count = len(rows)
+        encoded = [RecordTable._encode(row[0]) for row in rows]
+        keys = np.fromiter((RecordTable.path_key(b) for b in encoded), dtype='<u8', count=count)
+        order = np.argsort(keys, kind='stable')
+
+        def column(values, dtype):
+            return np.fromiter(values, dtype=dtype, count=count)[order]
+
+        hashes = column((row[3] or 0 for row in rows), '<u8')
+        flags = column((RecordTable.HAS_HASH if row[3] is not None else 0 for row in rows), 'u1')
+        sizes = column((row[1] or 0 for row in rows), '<u8')
+        mtimes = column((row[2] or 0 for row in rows), '<i8')
+        blurs = column((row[4] or 0.0 for row in rows), '<f4')
+        widths = column((row[5] or 0 for row in rows), '<u4')
+        heights = column((row[6] or 0 for row in rows), '<u4')
+        offsets = np.zeros(count + 1, dtype='<u8')
+        np.cumsum(column((len(b) for b in encoded), '<u8'), out=offsets[1:])
+        blob = b''.join([encoded[i] for i in order.tolist()])
+
+        with atomic_write(file_path) as f:
+            f.write(RecordTable.HEADER.pack(RecordTable.MAGIC, RecordTable.VERSION, 0, count, len(blob)))
+            for column in (keys[order], hashes, sizes, mtimes, offsets, blurs, widths, heights, flags):
+                f.write(column.tobytes())
+            f.write(blob)
+
+    @staticmethod
+    def open(file_path: str) -> Optional['RecordTable']:
+        """
+        Memory-maps a record file.
+
+        Returns:
+            The table, or None if the file is missing or not a record file
+            of this version.
+        """
+        table = RecordTable()
+        try:
+            with open(file_path, 'rb') as f:
+                header = f.read(RecordTable.HEADER.size)
+            if len(header) < RecordTable.HEADER.size:
+                return None
+            magic, version, _, count, blob_size = RecordTable.HEADER.unpack(header)
+            if magic != RecordTable.MAGIC or version != RecordTable.VERSION:
+                return None
+            expected = RecordTable.HEADER.size + count * 45 + (count + 1) * 8 + blob_size
+            if os.path.getsize(file_path) != expected:
+                return None
+            table.count = count
+            if count == 0:
+                return table
+
+            with open(file_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            offset = RecordTable.HEADER.size
+            columns = [('key', '<u8', count), ('hash', '<u8', count), ('size', '<u8', count),
+                       ('mtime_ns', '<i8', count), ('offsets', '<u8', count + 1),
+                       ('blur', '<f4', count), ('width', '<u4', count), ('height', '<u4', count),
+                       ('flags', 'u1', count), ('path_bytes', 'u1', blob_size)]
+            for name, dtype, length in columns:
+                if length:
+                    setattr(table, name, np.frombuffer(mapped, dtype=dtype, count=length, offset=offset))
+                offset += np.dtype(dtype).itemsize * length
+            return table
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Failed to open record file: {e}")
+            return None
+
+    def path(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.path_bytes[start:end].tobytes().decode('utf-8', 'surrogateescape')
+
+    def find(self, path: str) -> int:
+        """Row of a path, or -1."""
+        if not self.count:
+            return -1
+        key = np.uint64(self.path_key(self._encode(path)))
+        row = int(self.key.searchsorted(key))
+        while row < self.count and self.key[row] == key:
+            if self.path(row) == path:
+                return row
+            row += 1
+        return -1
+
+    def hash_value(self, row: int) -> Optional[int]:
+        """Integer hash of a row (see HashEngine.hash_to_int), or None."""
+        return int(self.hash[row]) if self.flags[row] & self.HAS_HASH else None
+
+    def image_hash(self, row: int, bits: int = 64) -> Optional[imagehash.ImageHash]:
+        """The row's hash as an ImageHash, or None."""
+        value = self.hash_value(row)
+        return HashEngine.int_to_hash(value, bits) if value is not None else None
+
+    def row(self, row: int) -> Row:
+        return (self.path(row), int(self.size[row]), int(self.mtime_ns[row]),
+                self.hash_value(row), float(self.blur[row]), int(self.width[row]), int(self.height[row]))
+
+    def rows(self, chunk_size: int = 65536) -> Iterator[Row]:
+        """Yields every row, converting the columns a chunk at a time."""
+        for start in range(0, self.count, chunk_size):
+            end = min(start + chunk_size, self.count)
+            offsets = self.offsets[start:end + 1].tolist()
+            base = offsets[0]
+            data = self.path_bytes[base:offsets[-1]].tobytes()
+            sizes = self.size[start:end].tolist()
+            mtimes = self.mtime_ns[start:end].tolist()
+            hashes = self.hash[start:end].tolist()
+            flags = self.flags[start:end].tolist()
+            blurs = self.blur[start:end].tolist()
+            widths = self.width[start:end].tolist()
+            heights = self.height[start:end].tolist()
+            for i in range(end - start):
+                path = data[offsets[i] - base:offsets[i + 1] - base].decode('utf-8', 'surrogateescape')
+                yield (path, sizes[i], mtimes[i], hashes[i] if flags[i] & self.HAS_HASH else None, blurs[i],
+                       widths[i], heights[i])
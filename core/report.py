@@ -0,0 +1,222 @@
+import os
+import csv
+import json
+from typing import Dict, List, Tuple, Any, Iterator, Iterable, Optional
+from PIL import Image
+from .hash_engine import HashEngine
+
+# Columns of a file row, in CSV order
+FIELDS = ['group', 'type', 'path', 'action', 'hash', 'blur_score', 'width', 'height', 'size']
+FORMATS = ('jsonl', 'csv')
+
+
+def report_groups(results: Dict[str, Any]) -> Iterator[Tuple[str, List[str]]]:
+    """(type, paths) of every reported group: blurry images first, then duplicates."""
+    if results['blurry']:
+        yield 'blurry', [path for path, _ in results['blurry']]
+    for group in results['groups']:
+        yield 'duplicate', group
+
+
+class ReportWriter:
+    """
+    Writes a scan report one file row at a time, as JSON lines or CSV.
+
+    Rows are written as groups are passed in and nothing is kept, so a
+    report of any size needs no more memory than the current group.
+    The resolution comes from the scan results; only files without one
+    have their image header read. The file size is read while writing.
+
+    JSON lines: a header, then for each group a group line followed by its
+    file lines, then a summary. CSV: a header row and one row per file,
+    with the group number and type repeated.
+    """
+    VERSION = 1
+
+    def __init__(self, out, format: str = 'jsonl'):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown report format: {format}")
+        self.out = out
+        self.format = format
+        self.groups = 0
+        self.files = 0
+        self.csv = csv.writer(out) if format == 'csv' else None
+
+    @staticmethod
+    def format_for(path: str) -> str:
+        """Report format from a file extension (.csv, otherwise JSON lines)."""
+        return 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl'
+
+    def _line(self, data: Dict[str, Any]):
+        self.out.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+    def write_header(self, folder: str = None):
+        if self.format == 'csv':
+            self.csv.writerow(FIELDS)
+        else:
+            self._line({'record': 'header', 'version': self.VERSION, 'folder': folder})
+
+    @staticmethod
+    def file_info(path: str, dimensions: Tuple[int, int] = None) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """
+        (width, height, size) of a file. Without known dimensions the
+        resolution is read from the image header.
+        """
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None, None, None
+        if dimensions is not None:
+            return dimensions[0], dimensions[1], size
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+        except Exception:
+            width = height = None
+        return width, height, size
+
+    def write_group(self, kind: str, paths: Iterable[str], actions: Dict[str, str] = None,
+                    hashes: Dict[str, Any] = None, blur_scores: Dict[str, float] = None,
+                    dimensions: Dict[str, Tuple[int, int]] = None):
+        """
+        Writes one group and a row per file.
+
+        Args:
+            kind: 'duplicate' or 'blurry'.
+            paths: Files of the group.
+            actions: path -> 'keep' or 'delete'.
+            hashes: path -> ImageHash or integer hash.
+            blur_scores: path -> blur score.
+            dimensions: path -> (width, height), as found by the scan.
+        """
+        actions = actions or {}
+        hashes = hashes or {}
+        blur_scores = blur_scores or {}
+        dimensions = dimensions or {}
+        self.groups += 1
+        paths = list(paths)
+        if self.format == 'jsonl':
+            self._line({'record': 'group', 'group': self.groups, 'type': kind, 'count': len(paths)})
+        for path in paths:
+            h = hashes.get(path)
+            width, height, size = self.file_info(path, dimensions.get(path))
+            row = {
+                'group': self.groups,
+                'type': kind,
+                'path': path,
+                'action': actions.get(path),
+                'hash': format(HashEngine.hash_to_int(h), 'x') if h is not None else None,
+                'blur_score': blur_scores.get(path),
+                'width': width,
+                'height': height,
+                'size': size,
+            }
+            if self.format == 'csv':
+                self.csv.writerow(['' if row[name] is None else row[name] for name in FIELDS])
+            else:
+                self._line(dict(record='file', **row))
+            self.files += 1
+
+    def write_summary(self, total_files: int):
+        if self.format == 'jsonl':
+            self._line({'record': 'summary', 'total_files': total_files,
+                        'groups': self.groups, 'files': self.files})
+        self.out.flush()
+
+    @staticmethod
+    def write_results(out, results: Dict[str, Any], actions: Dict[str, str],
+                      format: str = 'jsonl', folder: str = None):
+        """Writes scan results (as returned by ScanPipeline.run) as a report to out."""
+        writer = ReportWriter(out, format)
+        writer.write_header(folder)
+        for kind, paths in report_groups(results):
+            writer.write_group(kind, paths, actions, results.get('hashes'), results['blur_scores'],
+                               results.get('dimensions'))
+        writer.write_summary(results['total_files'])
+
+
+class ReportReader:
+    """Reads reports written by ReportWriter."""
+
+    @staticmethod
+    def rows(file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the file rows of a report, one at a time, with the same
+        keys and value types in both formats (missing values are None).
+        """
+        if ReportWriter.format_for(file_path) == 'csv':
+            with open(file_path, 'r', encoding='utf-8', newline='') as f:
+                for raw in csv.DictReader(f):
+                    row = {name: raw.get(name) or None for name in FIELDS}
+                    for name in ('group', 'width', 'height', 'size'):
+                        if row[name] is not None:
+                            row[name] = int(row[name])
+                    if row['blur_score'] is not None:
+                        row['blur_score'] = float(row['blur_score'])
+                    yield row
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get('record') == 'file':
+                        yield {name: data.get(name) for name in FIELDS}
+
+    @staticmethod
+    def folder(file_path: str) -> Optional[str]:
+        """Scanned folder recorded in a report's header, or None (CSV reports have none)."""
+        if ReportWriter.format_for(file_path) == 'csv':
+            return None
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    data = json.loads(line)
+                    return data.get('folder') if data.get('record') == 'header' else None
+        return None
+
+    @staticmethod
+    def load(file_path: str) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Rebuilds scan results and actions from a report.
+
+        Returns:
+            (results, actions): results as returned by a scan, where
+            total_files counts the files in the report, and the
+            recorded path -> action decisions.
+        """
+        blurry = []
+        groups = {}  # group number -> paths, in report order
+        blur_scores = {}
+        hashes = {}
+        dimensions = {}
+        file_sizes = {}
+        actions = {}
+        files = set()
+        for row in ReportReader.rows(file_path):
+            path = row['path']
+            files.add(path)
+            if row['blur_score'] is not None:
+                blur_scores[path] = row['blur_score']
+            if row['hash'] is not None:
+                hashes[path] = int(row['hash'], 16)
+            if row['width'] is not None and row['height'] is not None:
+                dimensions[path] = (row['width'], row['height'])
+            if row['size'] is not None:
+                file_sizes[path] = row['size']
+            if row['action'] in ('keep', 'delete'):
+                actions[path] = row['action']
+            if row['type'] == 'blurry':
+                blurry.append((path, row['blur_score'] or 0.0))
+            else:
+                groups.setdefault(row['group'], []).append(path)
+        results = {
+            'blurry': blurry,
+            'groups': [group for group in groups.values() if len(group) > 1],
+            'blur_scores': blur_scores,
+            'hashes': hashes,
+            'dimensions': dimensions,
+            'file_sizes': file_sizes,
+            'total_files': len(files),
+        }
+        return results, actions
@@ -5,13 +5,16 @@ from .blur_detector import BlurDetector
 
 class RuleEngine:
     @staticmethod
-    def apply_rules(group: List[str], preferences: Dict[str, Any] = None) -> Dict[str, str]:
+    def apply_rules(group: List[str], preferences: Dict[str, Any] = None,
+                    blur_scores: Dict[str, float] = None) -> Dict[str, str]:
         """
         Determines which images to keep and which to delete in a group.
         
         Args:
             group: List of image paths in the group.
             preferences: Dict of preferences (e.g., 'prefer_resolution', 'prefer_size').
+            blur_scores: Optional dict path -> blur score already computed during
+                         the scan. Only missing scores are calculated here.
             
         Returns:
             Dict mapping path -> 'keep' or 'delete'.
@@ -31,9 +34,11 @@ class RuleEngine:
                     width, height = img.size
                     resolution = width * height
                 
-                # Calculate blur score if needed (or pass it in if already calculated)
-                # For now, we calculate it here, but ideally it should be cached.
-                blur_score = BlurDetector.calculate_blur_score(path)
+                # Calculate blur score only if the scan didn't provide one
+                if blur_scores and path in blur_scores:
+                    blur_score = blur_scores[path]
+                else:
+                    blur_score = BlurDetector.calculate_blur_score(path)
                 
                 metadata.append({
                     'path': path,
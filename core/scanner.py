@@ -1,9 +1,28 @@
 import os
-from typing import List, Generator, Callable, Dict, Any
+import queue
+import threading
+from typing import List, Generator, Callable, Dict, Any, NamedTuple, Iterator, Tuple
 from PIL import Image, ExifTags
 
+class FileRecord(NamedTuple):
+    """A discovered file together with the stat fields fetched while listing it."""
+    path: str
+    size: int
+    mtime: float
+    mtime_ns: int
+    inode: int
+    dev: int
+
+    @classmethod
+    def from_stat(cls, path: str, st: os.stat_result) -> 'FileRecord':
+        return cls(path, st.st_size, st.st_mtime, st.st_mtime_ns, st.st_ino, st.st_dev)
+
+# callback(directory, files, subdirectories) for each listed directory
+ListingCallback = Callable[[str, List[FileRecord], List[str]], None]
+
 class Scanner:
     SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.heic', '.webp', '.mp4', '.avi', '.mov', '.mkv'}
+    VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv'}
 
     @staticmethod
     def get_exif_data(image_path: str) -> Dict[str, Any]:
@@ -28,38 +47,257 @@ class Scanner:
         return exif_data
 
     @staticmethod
-    def scan_directory(root_path: str, progress_callback: Callable[[int, int], None] = None) -> List[str]:
+    def _list_directory(directory: str) -> Tuple[List[FileRecord], List[str]]:
         """
-        Recursively scans the directory for supported images.
+        Lists one directory with os.scandir.
+        
+        Returns:
+            (supported files, subdirectories), both in listing order.
+        """
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                        ext = os.path.splitext(entry.name)[1].lower()
+                        if ext in Scanner.SUPPORTED_EXTENSIONS and entry.is_file():
+                            files.append(FileRecord.from_stat(entry.path, entry.stat()))
+                    except (OSError, PermissionError) as e:
+                        print(f"Warning: Could not access {entry.path}: {e}")
+                        continue
+        except (OSError, PermissionError) as e:
+            print(f"Warning: Could not list {directory}: {e}")
+        return files, subdirs
+
+    @staticmethod
+    def iter_files(root_path: str, on_listing: ListingCallback = None,
+                   start_dirs: List[str] = None) -> Iterator[FileRecord]:
+        """
+        Recursively yields supported files under root_path.
+        
+        Uses os.scandir so the directory listing and the one stat per file
+        are the only filesystem calls. Directories are visited depth-first
+        in listing order, like os.walk.
         
         Args:
             root_path: The directory to scan.
-            progress_callback: Optional callback (current_count, total_estimated). 
-                               Note: Total estimation is hard without pre-scan, 
-                               so we might just report count.
+            on_listing: Optional callback(directory, files, subdirs) called
+                        as each directory is listed, e.g. to checkpoint the walk.
+            start_dirs: Walk these directories instead of root_path, to
+                        resume an interrupted walk.
+        """
+        stack = list(reversed(start_dirs)) if start_dirs is not None else [root_path]
+        while stack:
+            directory = stack.pop()
+            files, subdirs = Scanner._list_directory(directory)
+            if on_listing:
+                on_listing(directory, files, subdirs)
+            yield from files
+            stack.extend(reversed(subdirs))
+
+    @staticmethod
+    def iter_files_parallel(root_path: str, workers: int = 8, ordered: bool = False,
+                            on_listing: ListingCallback = None,
+                            start_dirs: List[str] = None) -> Iterator[FileRecord]:
+        """
+        Recursively yields supported files, listing directories on a pool of threads.
         
-        Returns:
-            List of absolute file paths.
+        Directory listings are latency-bound on network shares, so several
+        are kept in flight at once. Idle threads take the next directory from
+        a shared queue, and each listed directory's files are yielded as soon
+        as they arrive.
+        
+        Args:
+            root_path: The directory to scan.
+            workers: Number of listing threads. 1 falls back to iter_files.
+            ordered: Buffer everything and yield in exactly the order of
+                     iter_files, instead of in discovery order.
+            on_listing, start_dirs: See iter_files. on_listing is called
+                     from the listing threads.
         """
-        image_files = []
+        if workers <= 1:
+            yield from Scanner.iter_files(root_path, on_listing, start_dirs)
+            return
+        starts = list(start_dirs) if start_dirs is not None else [root_path]
+        if not starts:
+            return
+        
+        # Each directory carries a sort key: its files get key + (0, i) and
+        # its subdirectories key + (1, j), which reproduces depth-first order.
+        directories = queue.Queue()
+        results = queue.Queue(maxsize=workers * 4)  # back-pressure on a slow consumer
+        done = object()
+        lock = threading.Lock()
+        outstanding = [len(starts)]  # directories queued or being listed
+        stopping = threading.Event()
         
-        # First pass to count files (optional, but good for progress bar if needed later)
-        # For now, we'll just walk and collect.
+        failed = object()
         
-        for root, _, files in os.walk(root_path):
-            for file in files:
+        def crawl():
+            while True:
+                item = directories.get()
+                if item is None or stopping.is_set():
+                    return
+                key, directory = item
                 try:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext in Scanner.SUPPORTED_EXTENSIONS:
-                        full_path = os.path.join(root, file)
-                        # Verify file exists and is accessible
-                        if os.path.isfile(full_path) and os.access(full_path, os.R_OK):
-                            image_files.append(full_path)
-                        
-                        if progress_callback:
-                            progress_callback(len(image_files))
-                except (OSError, PermissionError) as e:
-                    print(f"Warning: Could not access {file}: {e}")
+                    files, subdirs = Scanner._list_directory(directory)
+                    if on_listing:
+                        on_listing(directory, files, subdirs)
+                    with lock:
+                        outstanding[0] += len(subdirs)
+                    for j, subdir in enumerate(subdirs):
+                        directories.put((key + (1, j), subdir))
+                    results.put((key, files))
+                except Exception as e:
+                    # Raised to the consumer, which would otherwise wait forever
+                    results.put((failed, e))
+                finally:
+                    with lock:
+                        outstanding[0] -= 1
+                        if outstanding[0] == 0:
+                            results.put(done)
+        
+        threads = [threading.Thread(target=crawl, daemon=True) for _ in range(workers)]
+        for i, directory in enumerate(starts):
+            directories.put(((i,), directory))
+        for thread in threads:
+            thread.start()
+        
+        try:
+            buffered = []
+            while True:
+                item = results.get()
+                if item is done:
+                    break
+                key, files = item
+                if key is failed:
+                    raise files
+                if ordered:
+                    buffered.extend((key + (0, i), record) for i, record in enumerate(files))
+                else:
+                    yield from files
+            if ordered:
+                buffered.sort(key=lambda item: item[0])
+                for _, record in buffered:
+                    yield record
+        finally:
+            stopping.set()
+            for _ in threads:
+                directories.put(None)
+            # Unblock threads waiting to hand over a listing
+            for thread in threads:
+                while thread.is_alive():
+                    try:
+                        results.get(timeout=0.05)
+                    except queue.Empty:
+                        pass
+
+    @staticmethod
+    def stream_files(root_path: str, workers: int = 1, buffer_size: int = 1024,
+                     on_listing: ListingCallback = None, start_dirs: List[str] = None) -> Iterator[FileRecord]:
+        """
+        Yields supported files while a background thread keeps walking ahead.
+        
+        The walk runs concurrently with whatever the caller does with each
+        record, and at most buffer_size records wait in between, so memory
+        does not grow with the size of the tree. Files arrive in discovery
+        order; sort with path_sort_key for a stable order.
+        
+        Args:
+            root_path: The directory to scan.
+            workers: Directory listing threads (see iter_files_parallel).
+            buffer_size: Maximum number of records queued for the caller.
+            on_listing, start_dirs: See iter_files.
+
+        Raises:
+            Whatever stopped the walk, e.g. an exception from on_listing.
+        """
+        records = queue.Queue(maxsize=buffer_size)
+        done = object()
+        stopping = threading.Event()
+        
+        def put(item) -> bool:
+            while not stopping.is_set():
+                try:
+                    records.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
                     continue
-                        
-        return image_files
+            return False
+        
+        def produce():
+            walker = Scanner.iter_files_parallel(root_path, workers, on_listing=on_listing,
+                                                 start_dirs=start_dirs)
+            try:
+                for record in walker:
+                    if not put(record):
+                        return
+            except Exception as e:
+                # Handed to the consumer: a partial walk must not look finished
+                put(e)
+            finally:
+                walker.close()
+                put(done)
+        
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                record = records.get()
+                if record is done:
+                    return
+                if isinstance(record, Exception):
+                    raise record
+                yield record
+        finally:
+            stopping.set()
+
+    @staticmethod
+    def path_sort_key(path: str) -> Tuple[List[str], str]:
+        """
+        Sort key giving a deterministic depth-first order: directories by
+        name, each directory's files before the files of its subdirectories.
+        """
+        directory, name = os.path.split(os.path.normcase(path))
+        return directory.split(os.sep), name
+
+    @staticmethod
+    def scan_files(root_path: str, progress_callback: Callable[[int], None] = None,
+                   workers: int = 1) -> List[FileRecord]:
+        """
+        Recursively scans the directory for supported files.
+        
+        Args:
+            root_path: The directory to scan.
+            progress_callback: Optional callback receiving the number of files found so far.
+            workers: Directory listing threads (see iter_files_parallel).
+                     The result order does not depend on this.
+        
+        Returns:
+            List of FileRecord, carrying size, mtime and identity so later
+            stages never need to stat the files again.
+        """
+        records = []
+        for record in Scanner.iter_files_parallel(root_path, workers, ordered=True):
+            records.append(record)
+            if progress_callback:
+                progress_callback(len(records))
+        return records
+
+    @staticmethod
+    def scan_directory(root_path: str, progress_callback: Callable[[int], None] = None) -> List[str]:
+        """
+        Recursively scans the directory for supported images.
+        
+        Args:
+            root_path: The directory to scan.
+            progress_callback: Optional callback receiving the number of files found so far.
+        
+        Returns:
+            List of absolute file paths.
+        """
+        return [record.path for record in Scanner.scan_files(root_path, progress_callback)]
@@ -1,5 +1,6 @@
 import json
 import os
+from .atomic import atomic_write
 
 class Settings:
     """Manage application settings"""
@@ -8,6 +9,16 @@ class Settings:
         'thumbnail_size': 120,
         'window_geometry': None,
         'splitter_sizes': None,
+        'cache_path': None,  # None = shared cache in the home directory
+        'cache_content_fallback': False,
+        'scan_workers': None,  # None = one process per CPU core
+        'decode_target_size': None,  # None = full resolution; e.g. 1024 decodes faster, blur scores are approximate
+        'blur_threshold': 50.0,  # blur scores below this are reported as blurry
+        'walker_threads': 8,  # directory listing threads, 1 = sequential
+        'incremental_scan': False,  # rescans only process changed files (connected-component groups)
+        'scan_thumbnails': True,  # after a scan, write grid thumbnails of the grouped and blurry images
+        'thumbnail_cache_dir': None,  # None = ~/.duplicate_cleaner_thumbnails
+        'thumbnail_cache_mb': 512,  # LRU byte budget of the thumbnail cache
     }
     
     def __init__(self, settings_file=None):
@@ -34,7 +45,7 @@ class Settings:
     def save(self):
         """Save settings to file"""
         try:
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
+            with atomic_write(self.settings_file, 'w', encoding='utf-8') as f:
                 json.dump(self.settings, f, indent=2)
         except Exception as e:
             print(f"Failed to save settings: {e}")
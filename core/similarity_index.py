@@ -0,0 +1,393 @@
+"""Hamming-distance indexes over integer perceptual hashes"""
+import math
+from itertools import combinations
+from typing import Dict, List, Tuple, Iterator, Iterable
+import numpy as np
+from .atomic import atomic_write
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two integer hashes."""
+    return bin(a ^ b).count('1')
+
+
+# Per-byte popcount table for NumPy versions without np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount64(array: np.ndarray) -> np.ndarray:
+    """Element-wise popcount of a uint64 array, returned as uint8."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(array)
+    as_bytes = np.ascontiguousarray(array).view(np.uint8).reshape(array.shape + (8,))
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def pack_hashes(values: Iterable[int]) -> np.ndarray:
+    """Packs integer hashes (up to 64 bits) into a contiguous uint64 array."""
+    return np.fromiter(values, dtype=np.uint64)
+
+
+class SimilarityIndex:
+    """
+    Base class for hash indexes.
+
+    Items are identified by the sequential id returned from add().
+    Subclasses implement _insert() and query().
+    """
+
+    def __init__(self, bits: int = 64):
+        self.bits = bits
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value: int) -> int:
+        """Adds a hash and returns its id."""
+        item_id = len(self.values)
+        self.values.append(value)
+        self._insert(item_id, value)
+        return item_id
+
+    def add_all(self, values: Iterable[int]):
+        for value in values:
+            self.add(value)
+
+    def _insert(self, item_id: int, value: int):
+        raise NotImplementedError
+
+    def query(self, value: int, threshold: int) -> List[Tuple[int, int]]:
+        """
+        Finds all items within a Hamming distance.
+
+        Returns:
+            List of (item_id, distance) tuples, in no particular order.
+        """
+        raise NotImplementedError
+
+    def pairs(self, threshold: int) -> Iterator[Tuple[int, int, int]]:
+        """Yields every (i, j, distance) with i < j and distance <= threshold."""
+        for i, value in enumerate(self.values):
+            for j, dist in self.query(value, threshold):
+                if j > i:
+                    yield i, j, dist
+
+
+class LinearIndex(SimilarityIndex):
+    """Brute-force scan. Equivalent to the original pairwise loop."""
+
+    def _insert(self, item_id, value):
+        pass
+
+    def query(self, value, threshold):
+        results = []
+        for item_id, other in enumerate(self.values):
+            dist = hamming_distance(value, other)
+            if dist <= threshold:
+                results.append((item_id, dist))
+        return results
+
+
+class BKTree(SimilarityIndex):
+    """
+    Burkhard-Keller tree over the Hamming metric.
+
+    Each node is [value, ids, children] where children maps the distance
+    to the node onto a subtree. Identical hashes share one node.
+    """
+
+    def __init__(self, bits: int = 64):
+        super().__init__(bits)
+        self.root = None
+
+    def _insert(self, item_id, value):
+        if self.root is None:
+            self.root = [value, [item_id], {}]
+            return
+
+        node = self.root
+        while True:
+            dist = hamming_distance(value, node[0])
+            if dist == 0:
+                node[1].append(item_id)
+                return
+            child = node[2].get(dist)
+            if child is None:
+                node[2][dist] = [value, [item_id], {}]
+                return
+            node = child
+
+    def query(self, value, threshold):
+        results = []
+        if self.root is None:
+            return results
+
+        stack = [self.root]
+        while stack:
+            node_value, ids, children = stack.pop()
+            dist = hamming_distance(value, node_value)
+            if dist <= threshold:
+                results.extend((item_id, dist) for item_id in ids)
+            # Triangle inequality: only subtrees in [dist - t, dist + t] can match
+            low = dist - threshold
+            high = dist + threshold
+            for child_dist, child in children.items():
+                if low <= child_dist <= high:
+                    stack.append(child)
+        return results
+
+
+class MultiIndexHash(SimilarityIndex):
+    """
+    Multi-index hashing (Norouzi et al.).
+
+    The hash is split into `bands` contiguous substrings, each indexed in its
+    own hash table. By the pigeonhole principle two hashes within distance t
+    agree to within t // bands bits on at least one band, so a query only
+    probes the buckets near each of its substrings and verifies candidates.
+    """
+
+    def __init__(self, bits: int = 64, bands: int = 4):
+        super().__init__(bits)
+        self.bands = max(1, min(bands, bits))
+
+        # (shift, width) of each band, widths differ by at most one bit
+        self.band_layout = []
+        shift = 0
+        for b in range(self.bands):
+            width = bits // self.bands + (1 if b < bits % self.bands else 0)
+            self.band_layout.append((shift, width))
+            shift += width
+
+        self.tables = [{} for _ in range(self.bands)]  # type: List[Dict[int, List[int]]]
+        self._probe_masks = {}  # (width, radius) -> XOR masks to probe
+
+    @staticmethod
+    def bands_for(size: int, bits: int = 64) -> int:
+        """Band count that keeps roughly one item per bucket (bits / log2 N)."""
+        if size < 2:
+            return 1
+        return max(1, min(bits, round(bits / math.log2(size))))
+
+    def _insert(self, item_id, value):
+        for table, (shift, width) in zip(self.tables, self.band_layout):
+            key = (value >> shift) & ((1 << width) - 1)
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = [item_id]
+            else:
+                bucket.append(item_id)
+
+    def _masks(self, width: int, radius: int) -> List[int]:
+        masks = self._probe_masks.get((width, radius))
+        if masks is None:
+            masks = [0]
+            for r in range(1, min(radius, width) + 1):
+                for flips in combinations(range(width), r):
+                    masks.append(sum(1 << bit for bit in flips))
+            self._probe_masks[(width, radius)] = masks
+        return masks
+
+    def query(self, value, threshold):
+        radius = threshold // self.bands
+        candidates = set()
+        for table, (shift, width) in zip(self.tables, self.band_layout):
+            key = (value >> shift) & ((1 << width) - 1)
+            for mask in self._masks(width, radius):
+                bucket = table.get(key ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+
+        results = []
+        values = self.values
+        for item_id in candidates:
+            dist = hamming_distance(value, values[item_id])
+            if dist <= threshold:
+                results.append((item_id, dist))
+        return results
+
+
+class PackedHashIndex(SimilarityIndex):
+    """
+    Exact brute-force search over hashes packed into a uint64 array.
+
+    Distances are computed as vectorised XOR + popcount over tiles of at
+    most `tile_size` elements, so memory stays bounded for any N and no
+    N x N matrix is ever allocated. Only hashes up to 64 bits are supported.
+    """
+
+    def __init__(self, bits: int = 64, tile_size: int = 1 << 20):
+        if bits > 64:
+            raise ValueError("PackedHashIndex supports hashes up to 64 bits")
+        super().__init__(bits)
+        self.tile_size = tile_size
+        self.packed = np.empty(0, dtype=np.uint64)
+
+    def _insert(self, item_id, value):
+        pass
+
+    def _sync(self) -> np.ndarray:
+        """Packs values added since the last query."""
+        if len(self.packed) < len(self.values):
+            fresh = pack_hashes(self.values[len(self.packed):])
+            self.packed = np.concatenate([self.packed, fresh])
+        return self.packed
+
+    def query(self, value, threshold):
+        packed = self._sync()
+        target = np.uint64(value)
+        results = []
+        for start in range(0, len(packed), self.tile_size):
+            dist = popcount64(packed[start:start + self.tile_size] ^ target)
+            hits = np.flatnonzero(dist <= threshold)
+            results.extend(zip((hits + start).tolist(), dist[hits].tolist()))
+        return results
+
+    def pairs(self, threshold):
+        packed = self._sync()
+        n = len(packed)
+        rows = max(1, min(1024, self.tile_size // 1024))
+        cols = max(1, self.tile_size // rows)
+
+        for row_start in range(0, n, rows):
+            row_block = packed[row_start:row_start + rows, None]
+            # Only the upper triangle (j > i) is needed
+            for col_start in range(row_start, n, cols):
+                col_block = packed[None, col_start:col_start + cols]
+                dist = popcount64(row_block ^ col_block)
+                ii, jj = np.nonzero(dist <= threshold)
+                ii_abs = ii + row_start
+                jj_abs = jj + col_start
+                keep = jj_abs > ii_abs
+                for i, j, d in zip(ii_abs[keep].tolist(), jj_abs[keep].tolist(),
+                                   dist[ii[keep], jj[keep]].tolist()):
+                    yield i, j, d
+
+
+class MappedMultiIndex(SimilarityIndex):
+    """
+    Multi-index hashing over sorted arrays that can be saved and memory-mapped.
+    
+    The saved form is one uint64 .npy array with 1 + 2 * bands rows: the
+    hashes, then each band's sorted substrings, then the item ids in that
+    order. Buckets are found by binary search, so loading a saved index
+    builds no tables. Items added after loading go to an in-memory
+    MultiIndexHash until the index is written again.
+    """
+    VERSION = 1
+    
+    def __init__(self, bits: int = 64, bands: int = 4):
+        if bits > 64:
+            raise ValueError("MappedMultiIndex supports hashes up to 64 bits")
+        super().__init__(bits)
+        self.delta = MultiIndexHash(bits, bands)
+        self.bands = self.delta.bands
+        self.band_layout = self.delta.band_layout
+        self.table = np.empty((1 + 2 * self.bands, 0), dtype=np.uint64)
+        self.base_count = 0
+        self._mask_arrays = {}  # (width, radius) -> masks as uint64 array
+    
+    def _insert(self, item_id, value):
+        if item_id >= self.base_count:
+            self.delta.add(value)
+    
+    @staticmethod
+    def write(path: str, values: List[int], bits: int = 64, bands: int = 4) -> Dict:
+        """
+        Writes values as a saved index.
+        
+        Returns:
+            Metadata to pass back to load().
+        """
+        index = MappedMultiIndex(bits, bands)
+        packed = pack_hashes(values)
+        rows = [packed]
+        ids = []
+        for shift, width in index.band_layout:
+            keys = (packed >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+            order = np.argsort(keys, kind='stable')
+            rows.append(keys[order])
+            ids.append(order.astype(np.uint64))
+        table = np.vstack(rows + ids) if len(packed) else index.table
+        with atomic_write(path) as f:
+            np.save(f, table)
+        return {'version': MappedMultiIndex.VERSION, 'bits': bits, 'bands': index.bands, 'count': len(values)}
+    
+    @staticmethod
+    def load(path: str, meta: Dict) -> 'MappedMultiIndex':
+        """
+        Memory-maps an index saved by write().
+        
+        Returns:
+            The index, or None if the file is missing or does not match meta.
+        """
+        if not meta or meta.get('version') != MappedMultiIndex.VERSION:
+            return None
+        index = MappedMultiIndex(meta['bits'], meta['bands'])
+        try:
+            table = np.load(path, mmap_mode='r') if meta['count'] else index.table
+        except (OSError, ValueError) as e:
+            print(f"Failed to load similarity index: {e}")
+            return None
+        if table.dtype != np.uint64 or table.shape != (1 + 2 * index.bands, meta['count']):
+            return None
+        index.table = table
+        index.base_count = meta['count']
+        index.values = table[0].tolist()
+        return index
+    
+    def _mask_array(self, width: int, radius: int) -> np.ndarray:
+        masks = self._mask_arrays.get((width, radius))
+        if masks is None:
+            masks = np.array(self.delta._masks(width, radius), dtype=np.uint64)
+            self._mask_arrays[(width, radius)] = masks
+        return masks
+    
+    def query(self, value, threshold):
+        results = []
+        if self.base_count:
+            radius = threshold // self.bands
+            found = []
+            for b, (shift, width) in enumerate(self.band_layout):
+                keys = self.table[1 + b]
+                probes = np.uint64((value >> shift) & ((1 << width) - 1)) ^ self._mask_array(width, radius)
+                lows = np.searchsorted(keys, probes, 'left')
+                highs = np.searchsorted(keys, probes, 'right')
+                id_row = self.table[1 + self.bands + b]
+                for low, high in zip(lows.tolist(), highs.tolist()):
+                    if high > low:
+                        found.append(id_row[low:high])
+            if found:
+                candidates = np.unique(np.concatenate(found)).astype(np.int64)
+                dist = popcount64(self.table[0][candidates] ^ np.uint64(value))
+                hits = np.flatnonzero(dist <= threshold)
+                results.extend(zip(candidates[hits].tolist(), dist[hits].tolist()))
+        
+        offset = self.base_count
+        results.extend((offset + item_id, dist) for item_id, dist in self.delta.query(value, threshold))
+        return results
+
+
+INDEX_TYPES = {
+    'linear': LinearIndex,
+    'bktree': BKTree,
+    'mih': MultiIndexHash,
+    'numpy': PackedHashIndex,
+}
+
+
+def create_index(engine: str = 'mih', bits: int = 64, size_hint: int = 0) -> SimilarityIndex:
+    """
+    Creates an empty index by name.
+
+    Args:
+        engine: One of INDEX_TYPES ('linear', 'bktree', 'mih', 'numpy').
+        bits: Hash length in bits.
+        size_hint: Expected number of items, used to size multi-index bands.
+    """
+    if engine not in INDEX_TYPES:
+        raise ValueError(f"Unknown similarity engine: {engine}")
+    if engine == 'mih':
+        return MultiIndexHash(bits, MultiIndexHash.bands_for(size_hint, bits))
+    return INDEX_TYPES[engine](bits)
@@ -0,0 +1,219 @@
+import os
+import glob
+import pickle
+import hashlib
+from typing import Dict, List, Tuple, Any, Iterable, Optional
+import numpy as np
+from .scanner import Scanner, FileRecord
+from .blur_detector import BlurDetector
+from .group_builder import IncrementalGrouper
+from .records import RecordTable, Row
+from .atomic import atomic_write
+
+class ScanSnapshot:
+    """
+    State of the last scan of one folder, used for incremental rescans.
+
+    Stores, per file, the stat that was seen and the features that were
+    computed, plus the resulting groups. A rescan compares the new walk
+    against it and only processes files that were added or modified.
+
+    The per-file records are a memory-mapped RecordTable and the similarity
+    index a memory-mapped MappedMultiIndex. Each save writes both under a
+    new generation number, and the snapshot names the generation it belongs
+    to, so the three files never mismatch.
+    """
+    VERSION = 4
+
+    def __init__(self, root: str, threshold: int = 5, decode_size: int = None):
+        self.root = os.path.abspath(root)
+        self.threshold = threshold
+        self.decode_size = decode_size or 0  # decode size the recorded features were computed at
+        self.records = RecordTable()  # per-file stat and features
+        self.groups = []  # groups (union_find mode) of the recorded files
+        self.generation = 0  # number of the current record and index files
+        self.index_paths = []  # path of each index id
+        self.index_meta = None  # MappedMultiIndex metadata, None if no index was saved
+        self._seen = None  # rows matched by lookup() during a rescan
+        self._added = []  # paths passed to lookup() that are not recorded
+        self._modified = []  # recorded paths whose size or mtime changed
+
+    @staticmethod
+    def default_dir() -> str:
+        """User-level snapshot directory, next to the settings file."""
+        return os.path.join(os.path.expanduser("~"), '.duplicate_cleaner_snapshots')
+
+    @staticmethod
+    def path_for(root: str, directory: str = None) -> str:
+        """Snapshot file of a scan root, named after a digest of its path."""
+        digest = hashlib.sha1(os.path.abspath(root).encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(directory or ScanSnapshot.default_dir(), f"{digest[:16]}.snapshot")
+
+    @staticmethod
+    def load(root: str, threshold: int = 5, directory: str = None, decode_size: int = None) -> 'ScanSnapshot':
+        """
+        Loads the snapshot of root.
+
+        Returns:
+            The snapshot, or None if there is none, it was taken with a
+            different format, threshold or decode size, or its record file
+            is unusable.
+        """
+        snapshot_path = ScanSnapshot.path_for(root, directory)
+        if not os.path.exists(snapshot_path):
+            return None
+        try:
+            with open(snapshot_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('version') != ScanSnapshot.VERSION or data.get('threshold') != threshold:
+                return None
+            if data.get('decode_size') != (decode_size or 0):
+                return None
+            snapshot = ScanSnapshot(root, threshold, decode_size)
+            snapshot.groups = data['groups']
+            snapshot.generation = data['generation']
+            snapshot.index_paths = data['index_paths']
+            snapshot.index_meta = data['index_meta']
+            records = RecordTable.open(snapshot.generation_file('records', directory))
+            if records is None or len(records) != data['count']:
+                return None
+            snapshot.records = records
+            return snapshot
+        except Exception as e:
+            print(f"Failed to load scan snapshot: {e}")
+            return None
+
+    def generation_file(self, kind: str, directory: str = None) -> str:
+        """Record ('records') or index ('npy') file of the current generation."""
+        return f"{ScanSnapshot.path_for(self.root, directory)}.{self.generation}.{kind}"
+
+    def save(self, rows: Iterable[Row], directory: str = None, grouper: IncrementalGrouper = None):
+        """
+        Writes the snapshot with new records, as a new generation. With a
+        grouper its index is saved too. Older generations are removed.
+
+        Args:
+            rows: (path, size, mtime_ns, hash as int or None, blur_score, width, height)
+                per file, see Row.
+        """
+        snapshot_path = ScanSnapshot.path_for(self.root, directory)
+        try:
+            os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+            self.generation += 1
+            RecordTable.write(self.generation_file('records', directory), rows)
+            self.records = RecordTable.open(self.generation_file('records', directory)) or RecordTable()
+            if grouper is not None:
+                self.index_paths, self.index_meta = grouper.save_index(self.generation_file('npy', directory))
+            else:
+                self.index_paths, self.index_meta = [], None
+            data = {
+                'version': self.VERSION,
+                'root': self.root,
+                'threshold': self.threshold,
+                'decode_size': self.decode_size,
+                'count': len(self.records),
+                'groups': self.groups,
+                'generation': self.generation,
+                'index_paths': self.index_paths,
+                'index_meta': self.index_meta,
+            }
+            with atomic_write(snapshot_path) as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Failed to save scan snapshot: {e}")
+            return
+
+        current = {self.generation_file('records', directory), self.generation_file('npy', directory)}
+        for stale in glob.glob(glob.escape(snapshot_path) + ".*.*"):
+            if stale not in current:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def open_grouper(self, size_hint: int = 0, directory: str = None) -> IncrementalGrouper:
+        """
+        Grouper holding the snapshot's groups, on the memory-mapped index
+        when it is available, otherwise rebuilt from the stored hashes.
+        """
+        if self.index_meta is not None:
+            grouper = IncrementalGrouper.load(self.generation_file('npy', directory), self.index_meta,
+                                              self.index_paths, self.groups, self.threshold)
+            if grouper is not None:
+                return grouper
+        grouper = IncrementalGrouper(self.threshold, size_hint=max(size_hint, len(self.records)))
+        grouper.restore({row[0]: row[3] for row in self.records.rows()}, self.groups)
+        return grouper
+
+    def to_results(self, blur_threshold: float = 50.0) -> Dict[str, Any]:
+        """
+        Scan results as emitted by a scan, for showing the previous state
+        of a folder before it is rescanned. Nothing is read from disk, so
+        files removed since the snapshot are still listed until the rescan.
+
+        Args:
+            blur_threshold: Blur scores below this are reported as blurry,
+                as for ScanPipeline.
+        """
+        blurry = []
+        blur_scores = {}
+        hash_values = {}
+        dimensions = {}
+        file_sizes = {}
+        for path, size, _, value, score, width, height in self.records.rows():
+            blur_scores[path] = score
+            file_sizes[path] = size
+            if value is not None:
+                hash_values[path] = value
+            if width:
+                dimensions[path] = (width, height)
+            is_video = os.path.splitext(path)[1].lower() in Scanner.VIDEO_EXTENSIONS
+            if not is_video and BlurDetector.is_blurry(score, blur_threshold):
+                blurry.append((path, score))
+        blurry.sort(key=lambda item: Scanner.path_sort_key(item[0]))
+        groups = [group for group in self.groups if len(group) > 1]
+        reported = [path for path, _ in blurry] + [path for group in groups for path in group]
+        return {
+            'blurry': blurry,
+            'groups': groups,
+            'blur_scores': blur_scores,
+            'hashes': {path: hash_values[path] for path in reported if path in hash_values},
+            'dimensions': {path: dimensions[path] for path in reported if path in dimensions},
+            'file_sizes': {path: file_sizes[path] for path in reported},
+            'total_files': len(self.records)
+        }
+
+    def lookup(self, record: FileRecord) -> Optional[Tuple[Any, float, int, int]]:
+        """
+        Checks a walked file against the snapshot. Every walked file must
+        pass through here before diff() is called.
+
+        Returns:
+            (hash as int, blur_score, width, height) if the file is recorded
+            with the same size and mtime, otherwise None. The size is 0 x 0
+            when it is unknown.
+        """
+        if self._seen is None:
+            self._seen = np.zeros(len(self.records), dtype=bool)
+        row = self.records.find(record.path)
+        if row < 0:
+            self._added.append(record.path)
+            return None
+        self._seen[row] = True
+        records = self.records
+        if int(records.size[row]) == record.size and int(records.mtime_ns[row]) == record.mtime_ns:
+            return (records.hash_value(row), float(records.blur[row]),
+                    int(records.width[row]), int(records.height[row]))
+        self._modified.append(record.path)
+        return None
+
+    def diff(self) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Compares the files passed to lookup() with the snapshot.
+
+        Returns:
+            (added, removed, modified) lists of paths.
+        """
+        seen = self._seen if self._seen is not None else np.zeros(len(self.records), dtype=bool)
+        removed = [self.records.path(row) for row in np.flatnonzero(~seen).tolist()]
+        return list(self._added), removed, list(self._modified)
@@ -0,0 +1,234 @@
+import os
+import io
+import time
+import sqlite3
+import hashlib
+from typing import List, Tuple, Optional
+from PIL import Image, ImageOps
+from .atomic import atomic_write
+
+
+class ThumbnailCache:
+    """
+    Disk cache of thumbnails in three size tiers (128, 256 and 512 px).
+
+    A thumbnail is keyed by the file's identity (path, size, mtime_ns), so
+    an edited file simply misses and its old thumbnails age out. Each tier
+    is a small JPEG under directory/<xx>/<key>_<tier>.jpg; a file can be
+    found from its key alone, so worker processes write thumbnails without
+    touching the index.
+
+    The index is an SQLite table of (key, tier, bytes, last_used) used for
+    LRU eviction: trim() deletes the least recently used thumbnails until
+    the cache fits in max_bytes. New thumbnails and uses are buffered and
+    written on flush(); a thumbnail found on disk but missing from the
+    index (written by a scan that was stopped) is indexed when it is used.
+    """
+    TIERS = (128, 256, 512)
+    QUALITY = 85
+    VERSION = 2  # part of the key: thumbnails written by older versions are not rotated
+
+    def __init__(self, directory: str = None, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory or ThumbnailCache.default_dir()
+        self.max_bytes = max_bytes
+        self.conn = None
+        self.pending = {}  # (key, tier) -> (bytes, last use), waiting for flush()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.conn = sqlite3.connect(os.path.join(self.directory, 'index.db'))
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            with self.conn:
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS thumbnails ("
+                    "key TEXT NOT NULL, tier INTEGER NOT NULL, bytes INTEGER NOT NULL, "
+                    "last_used REAL NOT NULL, PRIMARY KEY (key, tier))")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_thumbnails_used ON thumbnails (last_used)")
+        except Exception as e:
+            print(f"Failed to open thumbnail cache: {e}")
+            self.conn = None
+
+    @staticmethod
+    def default_dir() -> str:
+        """User-level thumbnail directory, next to the settings file."""
+        return os.path.join(os.path.expanduser("~"), '.duplicate_cleaner_thumbnails')
+
+    @staticmethod
+    def key(path: str, size: int, mtime_ns: int) -> str:
+        """Key of a file version."""
+        identity = f"{ThumbnailCache.VERSION}\0{os.path.abspath(path)}\0{size}\0{mtime_ns}"
+        return hashlib.sha1(identity.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    @staticmethod
+    def key_for(path: str) -> Optional[str]:
+        """Key of a file as it is on disk now, or None if it cannot be read."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return ThumbnailCache.key(path, st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def tier_for(size: int) -> int:
+        """Smallest tier at least size pixels wide (the largest tier beyond that)."""
+        for tier in ThumbnailCache.TIERS:
+            if tier >= size:
+                return tier
+        return ThumbnailCache.TIERS[-1]
+
+    @staticmethod
+    def file_for(directory: str, key: str, tier: int) -> str:
+        return os.path.join(directory, key[:2], f"{key}_{tier}.jpg")
+
+    @staticmethod
+    def decode(data: bytes) -> Image.Image:
+        """
+        Decodes image bytes for thumbnails: JPEGs are decoded by libjpeg at
+        the smallest DCT scale that still covers the largest tier.
+        """
+        img = Image.open(io.BytesIO(data))
+        largest = ThumbnailCache.TIERS[-1]
+        if img.format == 'JPEG':
+            img.draft('RGB', (largest, largest))
+        return img
+
+    @staticmethod
+    def write_tiers(directory: str, key: str, img: Image.Image) -> List[Tuple[int, int]]:
+        """
+        Writes every tier of an image, largest first, each one scaled down
+        from the previous (img is resized in place). The EXIF orientation is
+        applied, so thumbnails are upright like the preview. Safe to call
+        from worker processes and threads.
+
+        Returns:
+            (tier, bytes) of each written file.
+        """
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            # JPEG has no alpha: flatten onto white
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, 'white')
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        elif img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        written = []
+        os.makedirs(os.path.join(directory, key[:2]), exist_ok=True)
+        for tier in reversed(ThumbnailCache.TIERS):
+            img.thumbnail((tier, tier))
+            target = ThumbnailCache.file_for(directory, key, tier)
+            # A thumbnail can always be made again: no fsync, only an atomic rename
+            with atomic_write(target, durable=False) as f:
+                img.save(f, 'JPEG', quality=ThumbnailCache.QUALITY)
+            written.append((tier, os.path.getsize(target)))
+        return written
+
+    def record(self, key: str, written: List[Tuple[int, int]]):
+        """Adds thumbnails written by write_tiers to the index."""
+        now = time.time()
+        for tier, size in written:
+            self.pending[(key, tier)] = (size, now)
+        if len(self.pending) >= 500:
+            self.flush()
+
+    @staticmethod
+    def fetch(directory: str, path: str, size: int,
+              create: bool = True) -> Optional[Tuple[str, str, List[Tuple[int, int]]]]:
+        """
+        Finds the thumbnail of path covering size pixels, making the tiers
+        from the original if they are missing and create is set. Only reads
+        and writes files, so it is safe to call from worker threads; the
+        caller passes key and written to record() on the cache's thread.
+
+        Returns:
+            (thumbnail file, key, [(tier, bytes), ...]) or None.
+        """
+        key = ThumbnailCache.key_for(path)
+        if key is None:
+            return None
+        tier = ThumbnailCache.tier_for(size)
+        thumbnail = ThumbnailCache.file_for(directory, key, tier)
+        try:
+            return thumbnail, key, [(tier, os.path.getsize(thumbnail))]
+        except OSError:
+            if not create:
+                return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            written = ThumbnailCache.write_tiers(directory, key, ThumbnailCache.decode(data))
+        except Exception as e:
+            print(f"Failed to create thumbnail for {path}: {e}")
+            return None
+        return thumbnail, key, written
+
+    def get(self, path: str, size: int) -> Optional[str]:
+        """
+        Thumbnail file of path covering size pixels, or None if it is not
+        cached for the file's current version.
+        """
+        found = self.fetch(self.directory, path, size, create=False)
+        if found is None:
+            return None
+        self.record(found[1], found[2])
+        return found[0]
+
+    def put(self, path: str, size: int) -> Optional[str]:
+        """Thumbnail file of path covering size pixels, made from the original if it is missing."""
+        found = self.fetch(self.directory, path, size)
+        if found is None:
+            return None
+        self.record(found[1], found[2])
+        return found[0]
+
+    def flush(self):
+        """Writes buffered additions and uses to the index."""
+        if self.conn is None:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO thumbnails (key, tier, bytes, last_used) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key, tier) DO UPDATE SET bytes = excluded.bytes, last_used = excluded.last_used",
+                    [(key, tier, size, used) for (key, tier), (size, used) in self.pending.items()])
+        except Exception as e:
+            print(f"Failed to update thumbnail index: {e}")
+        self.pending = {}
+
+    def total_bytes(self) -> int:
+        if self.conn is None:
+            return 0
+        return self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM thumbnails").fetchone()[0]
+
+    def trim(self):
+        """Deletes least recently used thumbnails until the cache fits in max_bytes."""
+        self.flush()
+        if self.conn is None:
+            return
+        try:
+            excess = self.total_bytes() - self.max_bytes
+            if excess <= 0:
+                return
+            evicted = []
+            for key, tier, size in self.conn.execute(
+                    "SELECT key, tier, bytes FROM thumbnails ORDER BY last_used"):
+                if excess <= 0:
+                    break
+                evicted.append((key, tier))
+                excess -= size
+            for key, tier in evicted:
+                try:
+                    os.remove(self.file_for(self.directory, key, tier))
+                except OSError:
+                    pass
+            with self.conn:
+                self.conn.executemany("DELETE FROM thumbnails WHERE key = ? AND tier = ?", evicted)
+        except Exception as e:
+            print(f"Failed to trim thumbnail cache: {e}")
+
+    def close(self):
+        """Flushes the index, evicts beyond the budget and closes."""
+        if self.conn is not None:
+            self.trim()
+            self.conn.close()
+            self.conn = None
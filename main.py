@@ -1,8 +1,11 @@
 import sys
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 
 def main():
+    # Needed for the feature extraction process pool in frozen builds
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -10,9 +10,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.scanner import Scanner
 from core.blur_detector import BlurDetector
 from core.hash_engine import HashEngine
-from core.group_builder import GroupBuilder
+from core.group_builder import GroupBuilder, IncrementalGrouper
 from core.rule_engine import RuleEngine
 from core.executor import Executor
+from core.records import RecordTable
+from core.report import ReportWriter, ReportReader
 
 def create_test_data(root_dir):
     if os.path.exists(root_dir):
@@ -75,6 +77,43 @@ def main():
     print(f"Found {len(groups)} groups.")
     for i, g in enumerate(groups):
         print(f"Group {i+1}: {[os.path.basename(p) for p in g]}")
+    
+    # All similarity engines must produce the same groups
+    for engine in ('linear', 'bktree', 'mih'):
+        same = GroupBuilder.build_groups(hashes, engine=engine) == groups
+        print(f"Engine {engine}: {'OK' if same else 'MISMATCH'}")
+    
+    groups_uf = GroupBuilder.build_groups(hashes, mode='union_find')
+    print(f"Union-find groups: {[[os.path.basename(p) for p in g] for g in groups_uf]}")
+    
+    # Patching groups in place must match a rebuild
+    grouper = IncrementalGrouper(threshold=5)
+    for path, h in hashes:
+        grouper.add(path, h)
+    grouper.remove(hashes[0][0])
+    rebuilt = GroupBuilder.build_groups(hashes[1:], mode='union_find')
+    print(f"Incremental groups: {'OK' if grouper.groups() == rebuilt else 'MISMATCH'}")
+    
+    # Compact records must round-trip hashes and sizes exactly
+    record_file = os.path.join(test_dir, "records.bin")
+    RecordTable.write(record_file, [(p, 1, 2, HashEngine.hash_to_int(h), 0.5, 640, 480) for p, h in hashes])
+    table = RecordTable.open(record_file)
+    same = all(table.image_hash(table.find(p)) == h and table.row(table.find(p))[5:] == (640, 480)
+               for p, h in hashes)
+    print(f"Record table: {'OK' if same else 'MISMATCH'}")
+    
+    # Exported reports must load back into the same groups, hashes and sizes
+    dimensions = {p: (640, 480) for g in groups for p in g}
+    for report_file in (os.path.join(test_dir, "report.jsonl"), os.path.join(test_dir, "report.csv")):
+        results = {'blurry': [], 'groups': groups, 'blur_scores': {}, 'hashes': dict(hashes),
+                   'dimensions': dimensions, 'total_files': len(files)}
+        with open(report_file, 'w', encoding='utf-8', newline='') as out:
+            ReportWriter.write_results(out, results, {}, ReportWriter.format_for(report_file))
+        loaded, _ = ReportReader.load(report_file)
+        same = loaded['groups'] == groups and all(
+            HashEngine.int_to_hash(loaded['hashes'][p]) == dict(hashes)[p] for g in groups for p in g
+        ) and loaded['dimensions'] == dimensions
+        print(f"Report {os.path.splitext(report_file)[1]}: {'OK' if same else 'MISMATCH'}")
         
     print("--- 4. Rule Engine ---")
     actions = {}
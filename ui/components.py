@@ -1,40 +1,186 @@
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QListWidget, QListWidgetItem, 
-                               QLabel, QScrollArea, QGridLayout, QCheckBox, QFrame,
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QTableView, QHeaderView, QAbstractItemView, QComboBox,
+                               QLabel, QScrollArea, QFrame,
                                QHBoxLayout, QPushButton, QSizePolicy, QSplitter, QMenu)
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt, Signal, QSize
+from PySide6.QtCore import Qt, Signal, QSize, QAbstractListModel, QModelIndex
 from PySide6.QtGui import QPixmap, QImage, QPainter, QColor, QIcon, QAction
 import os
+import numpy as np
+from ui.thumbnail_loader import read_scaled, image_size
+
+class GroupListModel(QAbstractListModel):
+    """
+    Groups of a scan as flat NumPy arrays, showing a filtered and sorted
+    selection of them. Row labels are formatted only when a row is painted,
+    and filtering or sorting is a few array operations, so hundreds of
+    thousands of groups refresh instantly.
+
+    The files of every group are stored back to back: file_ids holds an id
+    per path, starts the offset of each group. Whether a file is a delete
+    candidate is one flag per id, updated by set_deleted.
+    """
+    BLUR_TYPE = "ブレ画像"
+    SORT_KEYS = {  # key -> combo box label
+        'scan': "スキャン順",
+        'size': "枚数の多い順",
+        'wasted': "削減できる容量の多い順",
+        'blur': "ブレスコアの低い順",
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.set_groups([])
+
+    def set_groups(self, groups, group_types=None, actions=None, blur_scores=None, file_sizes=None):
+        """
+        Stores all groups; nothing is shown until show() is called.
+        file_sizes (path -> bytes, as recorded by the scan) drives the sort
+        by wasted bytes; files without one count as 0.
+        """
+        self.beginResetModel()
+        actions = actions or {}
+        blur_scores = blur_scores or {}
+        file_sizes = file_sizes or {}
+        self.groups = groups
+        self.types = [group_types[i] if group_types and i < len(group_types) else "重複"
+                      for i in range(len(groups))]
+        self.is_blur = np.array([t == self.BLUR_TYPE for t in self.types], dtype=bool)
+        self.lengths = np.fromiter((len(group) for group in groups), dtype=np.int64, count=len(groups))
+        self.starts = np.concatenate(([0], np.cumsum(self.lengths)[:-1])).astype(np.int64)
+        self.ids = {}  # path -> id, in id order
+        self.file_ids = np.array([self.ids.setdefault(path, len(self.ids)) for group in groups for path in group],
+                                 dtype=np.int64)
+        self.paths = list(self.ids)
+        to_delete = {path for path, action in actions.items() if action == 'delete'}
+        self.deleted = np.fromiter((path in to_delete for path in self.paths), dtype=bool, count=len(self.paths))
+        self.blur_scores = np.fromiter((blur_scores.get(path, np.nan) for path in self.paths),
+                                       dtype=np.float64, count=len(self.paths))
+        self.file_sizes = np.fromiter((file_sizes.get(path, 0) for path in self.paths),
+                                      dtype=np.int64, count=len(self.paths))
+        self.order = np.arange(0, dtype=np.int64)
+        self.endResetModel()
+
+    def set_deleted(self, path, deleted):
+        file_id = self.ids.get(path)
+        if file_id is not None:
+            self.deleted[file_id] = deleted
+
+    def reduce(self, ufunc, values):
+        """ufunc.reduceat of per-file values over each group (groups are never empty)"""
+        if not len(self.groups):
+            return np.zeros(0, dtype=values.dtype)
+        return ufunc.reduceat(values[self.file_ids], self.starts)
+
+    def sort_values(self, key):
+        """Per-group sort values, ordered ascending"""
+        if key == 'size':
+            return -self.lengths
+        if key == 'wasted':
+            # Every blurry image can go; of duplicates one copy stays
+            total = self.reduce(np.add, self.file_sizes)
+            return -np.where(self.is_blur, total, total - self.reduce(np.maximum, self.file_sizes))
+        if key == 'blur':
+            # Blurriest image of each group; groups without scores last
+            return self.reduce(np.fmin, self.blur_scores)
+        return None
+
+    def show(self, criteria=None, sort_key='scan'):
+        """
+        Shows the groups passing the filter criteria (as emitted by
+        FilterWidget), sorted by sort_key.
+
+        Returns:
+            Indices into the stored groups, in row order.
+        """
+        mask = np.ones(len(self.groups), dtype=bool)
+        if criteria:
+            if not criteria['show_blur']:
+                mask &= ~self.is_blur
+            if not criteria['show_duplicate']:
+                mask &= self.is_blur
+            has_delete = self.reduce(np.logical_or, self.deleted)
+            if not criteria['show_with_delete']:
+                mask &= ~has_delete
+            if not criteria['show_unprocessed']:
+                mask &= has_delete
+        order = np.flatnonzero(mask)
+        values = self.sort_values(sort_key)
+        if values is not None:
+            order = order[np.argsort(values[order], kind='stable')]
+        self.beginResetModel()
+        self.order = order
+        self.endResetModel()
+        return order
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        i = int(self.order[index.row()])
+        return f"グループ #{index.row() + 1} ({self.lengths[i]}枚)\n[{self.types[i]}]"
+
 
 class GroupListWidget(QWidget):
-    group_selected = Signal(int) # Emits group index
+    group_selected = Signal(int) # Emits row of the shown groups
     batch_operation = Signal(int, str)  # Emits group index and operation type
+    sort_changed = Signal(str)  # Emits sort key
 
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
         
-        self.list_widget = QListWidget()
-        self.list_widget.currentRowChanged.connect(self.group_selected.emit)
-        self.list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.list_widget.customContextMenuRequested.connect(self.show_context_menu)
-        self.layout.addWidget(self.list_widget)
-
-    def set_groups(self, groups, group_types=None):
-        self.list_widget.clear()
-        for i, group in enumerate(groups):
-            # Determine type
-            g_type = "重複" # Default
-            if group_types and i < len(group_types):
-                g_type = group_types[i]
-                
-            item = QListWidgetItem(f"グループ #{i+1} ({len(group)}枚)\n[{g_type}]")
-            self.list_widget.addItem(item)
-    
+        # Sort order
+        self.sort_combo = QComboBox()
+        for key, label in GroupListModel.SORT_KEYS.items():
+            self.sort_combo.addItem(label, key)
+        self.sort_combo.currentIndexChanged.connect(lambda _: self.sort_changed.emit(self.sort_key()))
+        self.layout.addWidget(self.sort_combo)
+        
+        self.model = GroupListModel()
+        # A table lays out only the visible rows; a QListView walks all of them
+        self.view = QTableView()
+        self.view.horizontalHeader().hide()
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.verticalHeader().hide()
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(2 * self.fontMetrics().lineSpacing() + 8)
+        self.view.setShowGrid(False)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setModel(self.model)
+        self.view.selectionModel().currentRowChanged.connect(
+            lambda current, previous: self.group_selected.emit(current.row()))
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.show_context_menu)
+        self.layout.addWidget(self.view)
+
+    def sort_key(self):
+        return self.sort_combo.currentData()
+
+    def set_groups(self, groups, group_types=None, actions=None, blur_scores=None, file_sizes=None):
+        """Stores the groups of a scan and shows all of them"""
+        self.model.set_groups(groups, group_types, actions, blur_scores, file_sizes)
+        self.model.show(sort_key=self.sort_key())
+
+    def show_groups(self, criteria=None):
+        """Shows the stored groups passing criteria; returns their indices in row order"""
+        return self.model.show(criteria, self.sort_key())
+
+    def set_deleted(self, path, deleted):
+        """Keeps the delete candidate filter up to date"""
+        self.model.set_deleted(path, deleted)
+
+    def current_row(self):
+        return self.view.currentIndex().row()
+
+    def set_current_row(self, row):
+        self.view.setCurrentIndex(self.model.index(row))
+
     def show_context_menu(self, position):
         """Show context menu for batch operations"""
-        current_row = self.list_widget.currentRow()
+        current_row = self.current_row()
         if current_row < 0:
             return
         
@@ -58,190 +204,7 @@ class GroupListWidget(QWidget):
         delete_except_newest.triggered.connect(lambda: self.batch_operation.emit(current_row, "delete_except_newest"))
         menu.addAction(delete_except_newest)
         
-        menu.exec(self.list_widget.mapToGlobal(position))
-
-class ThumbnailWidget(QFrame):
-    clicked = Signal(str) # Emits path
-    toggled = Signal(str, bool) # Emits path, is_checked
-
-    def __init__(self, path, is_checked=False, blur_score=None, size=120):
-        super().__init__()
-        self.path = path
-        self.thumbnail_size = size
-        self.setFrameStyle(QFrame.StyledPanel | QFrame.Raised)
-        self.setLineWidth(2)
-        
-        self.layout = QVBoxLayout(self)
-        self.layout.setContentsMargins(5, 5, 5, 5)
-        
-        # Image
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setFixedSize(size, size)
-        self.image_label.setStyleSheet("background-color: #eee;")
-        self.layout.addWidget(self.image_label)
-        
-        # Load thumbnail
-        self.load_thumbnail()
-        
-        # Info
-        info_layout = QHBoxLayout()
-        
-        # Checkbox
-        self.checkbox = QCheckBox("削除候補")
-        self.checkbox.setChecked(is_checked)
-        self.checkbox.toggled.connect(lambda c: self.toggled.emit(self.path, c))
-        info_layout.addWidget(self.checkbox)
-        
-        # Blur Icon/Text
-        if blur_score is not None:
-            blur_label = QLabel("⚠️" if blur_score < 50 else "✅")
-            blur_label.setToolTip(f"スコア: {blur_score:.1f}")
-            info_layout.addWidget(blur_label)
-            
-        self.layout.addLayout(info_layout)
-        
-        self.update_style()
-
-    def load_thumbnail(self):
-        pixmap = QPixmap(self.path)
-        if not pixmap.isNull():
-            self.image_label.setPixmap(pixmap.scaled(self.thumbnail_size, self.thumbnail_size, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-    
-    def set_thumbnail_size(self, size):
-        """Update thumbnail size"""
-        self.thumbnail_size = size
-        self.image_label.setFixedSize(size, size)
-        self.load_thumbnail()
-
-    def mousePressEvent(self, event):
-        self.clicked.emit(self.path)
-        super().mousePressEvent(event)
-
-    def set_selected(self, selected):
-        if selected:
-            self.setStyleSheet("ThumbnailWidget { border: 2px solid blue; background-color: #eef; }")
-        else:
-            self.update_style()
-            
-    def update_style(self):
-        if self.checkbox.isChecked():
-            self.setStyleSheet("ThumbnailWidget { background-color: #ffe0e0; border: 1px solid red; }")
-        else:
-            self.setStyleSheet("ThumbnailWidget { background-color: white; }")
-            
-    def set_checked(self, checked):
-        self.checkbox.setChecked(checked)
-        self.update_style()
-
-class ThumbnailGridWidget(QWidget):
-    selection_changed = Signal(list) # Emits list of selected paths
-    delete_toggled = Signal(str, bool)
-    batch_select_all = Signal()  # Signal for select all
-    batch_deselect_all = Signal()  # Signal for deselect all
-
-    def __init__(self):
-        super().__init__()
-        self.layout = QVBoxLayout(self)
-        self.layout.setContentsMargins(0, 0, 0, 0)
-        
-        # Toolbar for batch operations
-        self.toolbar = QHBoxLayout()
-        self.select_all_btn = QPushButton("全選択 (削除候補)")
-        self.select_all_btn.clicked.connect(self.batch_select_all.emit)
-        self.deselect_all_btn = QPushButton("全解除 (保持)")
-        self.deselect_all_btn.clicked.connect(self.batch_deselect_all.emit)
-        
-        self.toolbar.addWidget(self.select_all_btn)
-        self.toolbar.addWidget(self.deselect_all_btn)
-        self.toolbar.addStretch()
-        
-        self.layout.addLayout(self.toolbar)
-        
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.container = QWidget()
-        self.grid = QGridLayout(self.container)
-        self.grid.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        self.scroll.setWidget(self.container)
-        
-        self.layout.addWidget(self.scroll)
-        self.widgets = {}
-        self.selected_paths = [] # List of selected paths (max 2)
-        self.thumbnail_size = 120  # Default size
-        self.current_images = []
-        self.current_actions = {}
-        self.current_blur_scores = {}
-
-    def set_images(self, images, actions, blur_scores=None):
-        # Store current data for resizing
-        self.current_images = images
-        self.current_actions = actions
-        self.current_blur_scores = blur_scores if blur_scores else {}
-        
-        # Clear existing
-        for i in reversed(range(self.grid.count())): 
-            self.grid.itemAt(i).widget().setParent(None)
-        self.widgets = {}
-        self.selected_paths = []
-        
-        row = 0
-        col = 0
-        max_cols = 3
-        
-        for path in images:
-            is_checked = actions.get(path) == 'delete'
-            score = blur_scores.get(path) if blur_scores else None
-            
-            w = ThumbnailWidget(path, is_checked, score, self.thumbnail_size)
-            w.clicked.connect(self.handle_click)
-            w.toggled.connect(self.delete_toggled.emit)
-            w.toggled.connect(w.update_style)
-            
-            self.grid.addWidget(w, row, col)
-            self.widgets[path] = w
-            
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
-    
-    def set_thumbnail_size(self, size):
-        """Update thumbnail size for all thumbnails"""
-        self.thumbnail_size = size
-        # Refresh the grid with new size
-        self.set_images(self.current_images, self.current_actions, self.current_blur_scores)
-                
-    def handle_click(self, path):
-        modifiers = QApplication.keyboardModifiers()
-        
-        if modifiers & Qt.ControlModifier:
-            # Toggle selection
-            if path in self.selected_paths:
-                self.selected_paths.remove(path)
-            else:
-                if len(self.selected_paths) < 2:
-                    self.selected_paths.append(path)
-                else:
-                    # Replace the second one? Or ignore?
-                    # Let's replace the older one (FIFO) or just replace the second one
-                    self.selected_paths.pop(0)
-                    self.selected_paths.append(path)
-        else:
-            # Single selection
-            self.selected_paths = [path]
-            
-        self.update_selection_visuals()
-        self.selection_changed.emit(self.selected_paths)
-        
-    def update_selection_visuals(self):
-        for p, w in self.widgets.items():
-            w.set_selected(p in self.selected_paths)
-
-    def select_path(self, path):
-        self.selected_paths = [path]
-        self.update_selection_visuals()
-        self.selection_changed.emit(self.selected_paths)
+        menu.exec(self.view.mapToGlobal(position))
 
 class DetailWidget(QWidget):
     toggle_delete = Signal(str, bool)
@@ -345,27 +308,50 @@ class SinglePreview(QWidget):
         self.scroll.setWidgetResizable(False)  # Changed to False for zoom support
         self.layout.addWidget(self.scroll)
         
-        self.current_pixmap = None
+        self.current_pixmap = None  # Decoded at the smallest scale the zoom needs
+        self.image_size = None  # Full size of the current image
         self.zoom_level = 1.0
         self.current_path = None
         
     def set_image(self, path):
         self.current_path = path
+        self.current_pixmap = None
         if not path:
             self.image_label.clear()
-            self.current_pixmap = None
+            self.image_size = None
             return
         
-        self.current_pixmap = QPixmap(path)
-        if not self.current_pixmap.isNull():
-            self.zoom_level = 1.0
-            self.update_image_display()
+        # Only the header is read here; the image starts fitted to the view
+        self.image_size = image_size(path)
+        if not self.image_size.isValid():
+            self.image_size = None
+            return
+        viewport = self.scroll.viewport().size()
+        self.zoom_level = max(0.1, min(1.0, viewport.width() / self.image_size.width(),
+                                       viewport.height() / self.image_size.height()))
+        self.update_image_display()
+    
+    def load_for_zoom(self):
+        """Decode the image again if the zoom needs more pixels than were decoded"""
+        target = self.image_size * self.zoom_level
+        if self.current_pixmap is not None and self.current_pixmap.width() >= target.width():
+            return
+        # JPEGs decode at 1/8, 1/4, 1/2 or full scale: take the smallest that
+        # covers the zoom, so zooming in decodes again at most three times
+        for denominator in (8, 4, 2, 1):
+            if self.image_size.width() // denominator >= target.width():
+                break
+        self.current_pixmap = QPixmap.fromImage(read_scaled(
+            self.current_path, -(-self.image_size.width() // denominator),
+            -(-self.image_size.height() // denominator)))
     
     def update_image_display(self):
         """Update the displayed image with current zoom level"""
+        if self.image_size is not None:
+            self.load_for_zoom()
         if self.current_pixmap and not self.current_pixmap.isNull():
             scaled_pixmap = self.current_pixmap.scaled(
-                self.current_pixmap.size() * self.zoom_level,
+                self.image_size * self.zoom_level,
                 Qt.KeepAspectRatio,
                 Qt.SmoothTransformation
             )
@@ -1,179 +1,309 @@
 """Lazy loading thumbnail grid for better performance with large datasets"""
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QScrollArea, QGridLayout, 
-                               QHBoxLayout, QPushButton, QLabel)
-from PySide6.QtCore import Qt, Signal, QTimer
-from PySide6.QtGui import QPixmap
-from ui.components import ThumbnailWidget
+import os
+import math
+from array import array
+from collections import OrderedDict
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                               QListView, QStyledItemDelegate, QStyle, QStyleOptionButton,
+                               QAbstractItemView)
+from PySide6.QtCore import Qt, Signal, QAbstractListModel, QModelIndex, QRect, QSize
+from PySide6.QtGui import QPixmap, QColor, QPen
+from core.blur_detector import BlurDetector
+from ui.thumbnail_loader import ThumbnailLoader
+
+BLUR_ROLE = Qt.UserRole + 1  # blur score or None
+SELECTED_ROLE = Qt.UserRole + 2  # part of the preview selection
+
+
+class ThumbnailModel(QAbstractListModel):
+    """
+    Images of one group. Per-image state is kept in flat arrays indexed by
+    row, and pixmaps only for the most recently painted images, so the
+    model costs a few bytes per image however large the group is.
+    Thumbnails are requested from the loader when a cell is first painted.
+    """
+    MAX_PIXMAPS = 500  # decoded thumbnails kept; a few screens of cells
+
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+        self.loader.loaded.connect(self.on_thumbnail_loaded)
+        self.thumbnail_size = 120
+        self.paths = []
+        self.rows = {}  # path -> row
+        self.checked = bytearray()
+        self.blur_scores = array('d')  # NaN = no score
+        self.selected = set()  # rows
+        self.pixmaps = OrderedDict()  # path -> QPixmap, least recently painted first
+        self.requested = set()
+
+    def set_images(self, images, actions, blur_scores):
+        self.beginResetModel()
+        self.loader.cancel()
+        self.paths = list(images)
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+        self.checked = bytearray(actions.get(path) == 'delete' for path in self.paths)
+        self.blur_scores = array('d', (blur_scores.get(path, math.nan) for path in self.paths))
+        self.selected = set()
+        self.pixmaps.clear()
+        self.requested.clear()
+        self.endResetModel()
+
+    def set_thumbnail_size(self, size):
+        """Thumbnails are decoded again at the new size as they are painted"""
+        self.beginResetModel()
+        self.thumbnail_size = size
+        self.loader.cancel()
+        self.pixmaps.clear()
+        self.requested.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        path = self.paths[row]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.DecorationRole:
+            return self.pixmap(path)
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.checked[row] else Qt.Unchecked
+        if role == BLUR_ROLE:
+            score = self.blur_scores[row]
+            return None if math.isnan(score) else score
+        if role == SELECTED_ROLE:
+            return row in self.selected
+        if role == Qt.ToolTipRole:
+            score = self.blur_scores[row]
+            return path if math.isnan(score) else f"{path}\nスコア: {score:.1f}"
+        return None
+
+    def pixmap(self, path):
+        """Cached thumbnail of path, requesting it on the first miss"""
+        pixmap = self.pixmaps.get(path)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(path)
+            return pixmap
+        if path not in self.requested:
+            self.requested.add(path)
+            self.loader.request(path, self.thumbnail_size)
+        return None
+
+    def on_thumbnail_loaded(self, path, image):
+        row = self.rows.get(path)
+        if row is None:
+            return
+        self.requested.discard(path)
+        self.pixmaps[path] = QPixmap.fromImage(image)
+        while len(self.pixmaps) > self.MAX_PIXMAPS:
+            self.pixmaps.popitem(last=False)
+        self.row_changed(row)
+
+    def row_changed(self, row):
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def set_checked(self, path, checked):
+        row = self.rows.get(path)
+        if row is not None and self.checked[row] != checked:
+            self.checked[row] = checked
+            self.row_changed(row)
+
+    def set_selected(self, paths):
+        rows = {self.rows[path] for path in paths if path in self.rows}
+        changed = rows ^ self.selected
+        self.selected = rows
+        for row in changed:
+            self.row_changed(row)
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """Paints a cell as the thumbnail, a delete checkbox and the blur mark"""
+    MARGIN = 5
+    FOOTER = 26  # checkbox row below the image
+
+    def __init__(self, parent=None, blur_threshold=50.0):
+        super().__init__(parent)
+        self.thumbnail_size = 120
+        self.blur_threshold = blur_threshold  # scores below it get the warning mark
+
+    def sizeHint(self, option, index):
+        return QSize(self.thumbnail_size + 2 * self.MARGIN,
+                     self.thumbnail_size + 2 * self.MARGIN + self.FOOTER)
+
+    def image_rect(self, rect):
+        return QRect(rect.x() + self.MARGIN, rect.y() + self.MARGIN, self.thumbnail_size, self.thumbnail_size)
+
+    def checkbox_rect(self, rect):
+        image = self.image_rect(rect)
+        return QRect(image.left(), image.bottom() + 4, image.width() - 22, self.FOOTER - 4)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect.adjusted(1, 1, -1, -1)
+        checked = index.data(Qt.CheckStateRole) == Qt.Checked
+        if index.data(SELECTED_ROLE):
+            painter.fillRect(rect, QColor("#eef"))
+            painter.setPen(QPen(QColor("blue"), 2))
+        elif checked:
+            painter.fillRect(rect, QColor("#ffe0e0"))
+            painter.setPen(QColor("red"))
+        else:
+            painter.fillRect(rect, QColor("white"))
+            painter.setPen(QColor("#ccc"))
+        painter.drawRect(rect)
+
+        image_rect = self.image_rect(option.rect)
+        painter.fillRect(image_rect, QColor("#eee"))
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap is not None and not pixmap.isNull():
+            if pixmap.width() > image_rect.width() or pixmap.height() > image_rect.height():
+                pixmap = pixmap.scaled(image_rect.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            painter.drawPixmap(image_rect.x() + (image_rect.width() - pixmap.width()) // 2,
+                               image_rect.y() + (image_rect.height() - pixmap.height()) // 2, pixmap)
+
+        checkbox = QStyleOptionButton()
+        checkbox.rect = self.checkbox_rect(option.rect)
+        checkbox.text = "削除候補"
+        checkbox.state = QStyle.State_Enabled | (QStyle.State_On if checked else QStyle.State_Off)
+        style = option.widget.style() if option.widget else None
+        if style is not None:
+            style.drawControl(QStyle.CE_CheckBox, checkbox, painter, option.widget)
+
+        score = index.data(BLUR_ROLE)
+        if score is not None:
+            mark = QRect(checkbox.rect.right(), checkbox.rect.top(), 22, checkbox.rect.height())
+            painter.drawText(mark, Qt.AlignCenter,
+                             "⚠️" if BlurDetector.is_blurry(score, self.blur_threshold) else "✅")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        # Clicks are handled by ThumbnailView; the default check toggling would bypass it
+        return False
+
+
+class ThumbnailView(QListView):
+    """Icon-mode list that reports plain clicks and checkbox clicks separately"""
+    item_clicked = Signal(int)  # row
+    checkbox_clicked = Signal(int)  # row
+
+    def mousePressEvent(self, event):
+        index = self.indexAt(event.position().toPoint())
+        if index.isValid() and event.button() == Qt.LeftButton:
+            if self.itemDelegate().checkbox_rect(self.visualRect(index)).contains(event.position().toPoint()):
+                self.checkbox_clicked.emit(index.row())
+            else:
+                self.item_clicked.emit(index.row())
+        super().mousePressEvent(event)
+
 
 class LazyThumbnailGridWidget(QWidget):
-    """Optimized thumbnail grid with lazy loading"""
+    """
+    Thumbnail grid over a model and delegate: only the visible cells are
+    painted and their thumbnails decoded, so a group of any size costs no
+    more widgets or pixmaps than fit in the view.
+    """
     selection_changed = Signal(list)
     delete_toggled = Signal(str, bool)
     batch_select_all = Signal()
     batch_deselect_all = Signal()
 
-    def __init__(self):
+    def __init__(self, thumbnail_cache=None, blur_threshold=50.0):
         super().__init__()
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
-        
+
         # Toolbar
         self.toolbar = QHBoxLayout()
         self.select_all_btn = QPushButton("全選択 (削除候補)")
         self.select_all_btn.clicked.connect(self.batch_select_all.emit)
         self.deselect_all_btn = QPushButton("全解除 (保持)")
         self.deselect_all_btn.clicked.connect(self.batch_deselect_all.emit)
-        
+
         # Info label
         self.info_label = QLabel("")
-        
+
         self.toolbar.addWidget(self.select_all_btn)
         self.toolbar.addWidget(self.deselect_all_btn)
         self.toolbar.addWidget(self.info_label)
         self.toolbar.addStretch()
-        
+
         self.layout.addLayout(self.toolbar)
-        
-        # Scroll area
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.verticalScrollBar().valueChanged.connect(self.on_scroll)
-        
-        self.container = QWidget()
-        self.grid = QGridLayout(self.container)
-        self.grid.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        self.scroll.setWidget(self.container)
-        
-        self.layout.addWidget(self.scroll)
-        
+
+        # Thumbnails are decoded on a thread pool and arrive through the model
+        self.loader = ThumbnailLoader(thumbnail_cache)
+        self.model = ThumbnailModel(self.loader)
+        self.delegate = ThumbnailDelegate(self, blur_threshold)
+
+        self.view = ThumbnailView()
+        self.view.setViewMode(QListView.IconMode)
+        self.view.setFlow(QListView.LeftToRight)
+        self.view.setWrapping(True)
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setMovement(QListView.Static)
+        self.view.setUniformItemSizes(True)  # layout without asking every item its size
+        self.view.setSpacing(4)
+        self.view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.view.setFocusPolicy(Qt.NoFocus)  # arrow keys and space belong to the main window
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setModel(self.model)
+        self.view.item_clicked.connect(lambda row: self.handle_click(self.model.paths[row]))
+        self.view.checkbox_clicked.connect(self.handle_checkbox_click)
+        self.layout.addWidget(self.view)
+
         # Data
-        self.widgets = {}
         self.selected_paths = []
         self.thumbnail_size = 120
         self.current_images = []
         self.current_actions = {}
         self.current_blur_scores = {}
-        
-        # Lazy loading
-        self.loaded_widgets = set()  # Track which widgets are loaded
-        self.load_batch_size = 50  # Load 50 thumbnails at a time
-        self.load_timer = QTimer()
-        self.load_timer.timeout.connect(self.load_next_batch)
-        self.load_timer.setSingleShot(True)
-        self.pending_load_start = 0
 
     def set_images(self, images, actions, blur_scores=None):
-        """Set images with lazy loading"""
-        # Store data
+        """Set the images of a group; nothing is decoded until cells are painted"""
         self.current_images = images
         self.current_actions = actions
         self.current_blur_scores = blur_scores if blur_scores else {}
-        
-        # Clear existing
-        for i in reversed(range(self.grid.count())): 
-            widget = self.grid.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-                widget.deleteLater()
-        
-        self.widgets = {}
-        self.loaded_widgets.clear()
         self.selected_paths = []
-        
+
+        self.model.set_images(images, actions, self.current_blur_scores)
+        self.view.scrollToTop()
+
         # Update info
         self.info_label.setText(f"合計: {len(images)} 枚")
-        
-        # Create placeholder widgets
-        row = 0
-        col = 0
-        max_cols = 3
-        
-        for path in images:
-            # Create lightweight placeholder
-            placeholder = QLabel("読込中...")
-            placeholder.setFixedSize(self.thumbnail_size, self.thumbnail_size)
-            placeholder.setAlignment(Qt.AlignCenter)
-            placeholder.setStyleSheet("background-color: #f0f0f0; border: 1px solid #ddd;")
-            
-            self.grid.addWidget(placeholder, row, col)
-            self.widgets[path] = placeholder
-            
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
-        
-        # Start lazy loading
-        self.pending_load_start = 0
-        self.load_next_batch()
-    
-    def load_next_batch(self):
-        """Load next batch of thumbnails"""
-        if self.pending_load_start >= len(self.current_images):
-            return
-        
-        end = min(self.pending_load_start + self.load_batch_size, len(self.current_images))
-        
-        for i in range(self.pending_load_start, end):
-            path = self.current_images[i]
-            if path in self.loaded_widgets:
-                continue
-            
-            # Replace placeholder with actual thumbnail
-            placeholder = self.widgets.get(path)
-            if placeholder:
-                # Get position
-                index = self.grid.indexOf(placeholder)
-                if index >= 0:
-                    row, col, _, _ = self.grid.getItemPosition(index)
-                    
-                    # Remove placeholder
-                    placeholder.setParent(None)
-                    placeholder.deleteLater()
-                    
-                    # Create actual thumbnail
-                    is_checked = self.current_actions.get(path) == 'delete'
-                    score = self.current_blur_scores.get(path)
-                    
-                    w = ThumbnailWidget(path, is_checked, score, self.thumbnail_size)
-                    w.clicked.connect(self.handle_click)
-                    w.toggled.connect(self.delete_toggled.emit)
-                    w.toggled.connect(w.update_style)
-                    
-                    self.grid.addWidget(w, row, col)
-                    self.widgets[path] = w
-                    self.loaded_widgets.add(path)
-        
-        self.pending_load_start = end
-        
-        # Continue loading if there are more
-        if self.pending_load_start < len(self.current_images):
-            self.load_timer.start(10)  # Load next batch after 10ms
-    
-    def on_scroll(self, value):
-        """Load more thumbnails when scrolling"""
-        # Calculate visible range
-        viewport_height = self.scroll.viewport().height()
-        content_height = self.container.height()
-        
-        if content_height > 0:
-            visible_ratio = (value + viewport_height) / content_height
-            
-            # If scrolled past 70%, load more
-            if visible_ratio > 0.7 and not self.load_timer.isActive():
-                self.load_next_batch()
-    
+
     def set_thumbnail_size(self, size):
         """Update thumbnail size"""
         self.thumbnail_size = size
-        # Reload all images with new size
-        self.set_images(self.current_images, self.current_actions, self.current_blur_scores)
-    
+        self.delegate.thumbnail_size = size
+        self.model.set_thumbnail_size(size)
+        self.model.set_selected(self.selected_paths)
+
+    def set_checked(self, path, checked):
+        """Update the checkbox of a path"""
+        self.model.set_checked(path, checked)
+
+    def scroll_to(self, path):
+        """Scroll so that path is visible"""
+        row = self.model.rows.get(path)
+        if row is not None:
+            self.view.scrollTo(self.model.index(row))
+
+    def handle_checkbox_click(self, row):
+        path = self.model.paths[row]
+        checked = not self.model.checked[row]
+        self.model.set_checked(path, checked)
+        self.delete_toggled.emit(path, checked)
+
     def handle_click(self, path):
         """Handle thumbnail click"""
         from PySide6.QtWidgets import QApplication
         modifiers = QApplication.keyboardModifiers()
-        
+
         if modifiers & Qt.ControlModifier:
             if path in self.selected_paths:
                 self.selected_paths.remove(path)
@@ -185,16 +315,14 @@ class LazyThumbnailGridWidget(QWidget):
                     self.selected_paths.append(path)
         else:
             self.selected_paths = [path]
-            
+
         self.update_selection_visuals()
         self.selection_changed.emit(self.selected_paths)
-    
+
     def update_selection_visuals(self):
         """Update selection visuals"""
-        for p, w in self.widgets.items():
-            if isinstance(w, ThumbnailWidget):
-                w.set_selected(p in self.selected_paths)
-    
+        self.model.set_selected(self.selected_paths)
+
     def select_path(self, path):
         """Select a specific path"""
         self.selected_paths = [path]
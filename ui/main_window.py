@@ -7,12 +7,14 @@ from PySide6.QtGui import QAction
 
 # Import core modules
 from core.scanner import Scanner
-from core.blur_detector import BlurDetector
-from core.hash_engine import HashEngine
-from core.group_builder import GroupBuilder
 from core.rule_engine import RuleEngine
 from core.executor import Executor
 from core.settings import Settings
+from core.snapshot import ScanSnapshot
+from core.checkpoint import ScanCheckpoint
+from core.pipeline import ScanPipeline
+from core.report import ReportWriter, ReportReader
+from core.thumbnail_cache import ThumbnailCache
 
 # Import UI components
 from ui.components import GroupListWidget, PreviewWidget, DetailWidget
@@ -29,6 +31,8 @@ class MainWindow(QMainWindow):
         
         # Load settings
         self.settings = Settings()
+        self.thumbnail_cache = ThumbnailCache(self.settings.get('thumbnail_cache_dir'),
+                                              self.settings.get('thumbnail_cache_mb', 512) * 1024 * 1024)
         
         # Apply stylesheet
         try:
@@ -47,8 +51,15 @@ class MainWindow(QMainWindow):
         self.browse_btn = QPushButton("フォルダを選択")
         self.browse_btn.clicked.connect(self.browse_folder)
         self.scan_btn = QPushButton("スキャン開始")
-        self.scan_btn.clicked.connect(self.start_scan)
+        self.scan_btn.clicked.connect(lambda: self.start_scan())
         self.scan_btn.setEnabled(False)
+        self.resume_btn = QPushButton("スキャン再開")
+        self.resume_btn.clicked.connect(lambda: self.start_scan(resume=True))
+        self.resume_btn.setEnabled(False)
+        self.resume_btn.setToolTip("中断したスキャンを続きから再開")
+        self.stop_btn = QPushButton("中止")
+        self.stop_btn.clicked.connect(self.stop_scan)
+        self.stop_btn.setEnabled(False)
         
         # Thumbnail size slider
         self.thumb_size_label = QLabel("サムネイルサイズ:")
@@ -74,6 +85,8 @@ class MainWindow(QMainWindow):
         self.top_bar.addWidget(self.thumb_size_slider)
         self.top_bar.addWidget(self.thumb_size_value_label)
         self.top_bar.addWidget(self.scan_btn)
+        self.top_bar.addWidget(self.resume_btn)
+        self.top_bar.addWidget(self.stop_btn)
         
         self.layout.addLayout(self.top_bar)
         
@@ -113,10 +126,12 @@ class MainWindow(QMainWindow):
         self.group_list = GroupListWidget()
         self.group_list.group_selected.connect(self.on_group_selected)
         self.group_list.batch_operation.connect(self.handle_batch_operation)
+        self.group_list.sort_changed.connect(lambda key: self.apply_filters(self.filter_criteria))
         self.bottom_splitter.addWidget(self.group_list)
         
         # Center: Thumbnails (Lazy Loading)
-        self.thumbnail_grid = LazyThumbnailGridWidget()
+        self.thumbnail_grid = LazyThumbnailGridWidget(self.thumbnail_cache,
+                                                      self.settings.get('blur_threshold', 50.0))
         self.thumbnail_grid.selection_changed.connect(self.on_selection_changed)
         self.thumbnail_grid.delete_toggled.connect(self.on_delete_toggled)
         self.thumbnail_grid.batch_select_all.connect(self.batch_select_all_current_group)
@@ -142,6 +157,15 @@ class MainWindow(QMainWindow):
         self.execute_btn = QPushButton("処理を実行 (ゴミ箱へ移動)")
         self.execute_btn.clicked.connect(self.execute_actions)
         self.execute_btn.setEnabled(False)
+        self.import_btn = QPushButton("レポート読込")
+        self.import_btn.clicked.connect(self.import_report)
+        self.import_btn.setToolTip("書き出したレポート (JSONL/CSV) を読み込んで表示")
+        self.export_btn = QPushButton("レポート出力")
+        self.export_btn.clicked.connect(self.export_report)
+        self.export_btn.setEnabled(False)
+        self.export_btn.setToolTip("グループと各ファイルの情報・処理内容を JSONL/CSV で書き出し")
+        self.bottom_bar.addWidget(self.import_btn)
+        self.bottom_bar.addWidget(self.export_btn)
         self.bottom_bar.addStretch()
         self.bottom_bar.addWidget(self.execute_btn)
         
@@ -172,6 +196,8 @@ class MainWindow(QMainWindow):
             self.selected_folder = folder
             self.path_label.setText(folder)
             self.scan_btn.setEnabled(True)
+            self.update_resume_button()
+            self.show_previous_results(folder)
     
     def on_thumbnail_size_changed(self, value):
         """Handle thumbnail size slider change"""
@@ -179,13 +205,20 @@ class MainWindow(QMainWindow):
         self.thumbnail_grid.set_thumbnail_size(value)
         self.settings.set('thumbnail_size', value)
 
-    def start_scan(self):
+    def update_resume_button(self):
+        """Enable resuming when the selected folder has an interrupted scan."""
+        self.resume_btn.setEnabled(bool(self.selected_folder) and ScanCheckpoint.exists(self.selected_folder))
+
+    def start_scan(self, resume=False):
         if not self.selected_folder:
             return
             
         self.scan_btn.setEnabled(False)
+        self.resume_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
         self.browse_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
         self.progress_detail_label.setVisible(True)
         self.progress_detail_label.setText("初期化中...")
@@ -198,18 +231,50 @@ class MainWindow(QMainWindow):
         self.detail_widget.set_info(None)
         
         # Start Thread
-        self.scan_thread = ScanWorker(self.selected_folder)
+        self.scan_thread = ScanWorker(self.selected_folder,
+                                      cache_path=self.settings.get('cache_path'),
+                                      content_fallback=self.settings.get('cache_content_fallback', False),
+                                      workers=self.settings.get('scan_workers'),
+                                      decode_size=self.settings.get('decode_target_size'),
+                                      walker_threads=self.settings.get('walker_threads', 1),
+                                      incremental=self.settings.get('incremental_scan', False),
+                                      blur_threshold=self.settings.get('blur_threshold', 50.0),
+                                      resume=resume,
+                                      thumbnail_dir=(self.thumbnail_cache.directory
+                                                     if self.settings.get('scan_thumbnails', True) else None),
+                                      thumbnail_cache_bytes=self.thumbnail_cache.max_bytes)
         self.scan_thread.progress.connect(self.update_progress)
         self.scan_thread.progress_detail.connect(self.update_progress_detail)
         self.scan_thread.status.connect(self.update_status)
         self.scan_thread.finished.connect(self.scan_finished)
+        self.scan_thread.stopped.connect(self.scan_stopped)
+        self.scan_thread.failed.connect(self.scan_failed)
         self.scan_thread.start()
 
+    def stop_scan(self):
+        """Stop the running scan; its progress is kept for スキャン再開."""
+        if self.scan_thread is not None and self.scan_thread.isRunning():
+            self.stop_btn.setEnabled(False)
+            self.status_label.setText("スキャンを中止中...")
+            self.scan_thread.stop()
+
     def update_progress(self, value):
+        if self.progress_bar.maximum() == 0:
+            self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(value)
     
-    def update_progress_detail(self, current_file, processed, total, elapsed_time):
+    def update_progress_detail(self, current_file, processed, total, elapsed_time, total_known=True):
         """Update detailed progress information"""
+        if not total_known:
+            # Still walking the folder: show a busy bar and found/processed counts
+            self.progress_bar.setRange(0, 0)
+            detail_text = f"処理中: {os.path.basename(current_file)}\n{processed} ファイル処理済み / {total} ファイル検出 (検索中...)"
+            self.progress_detail_label.setText(detail_text)
+            return
+        
+        if self.progress_bar.maximum() == 0:
+            self.progress_bar.setRange(0, 100)
+        
         # Calculate estimated time remaining
         if processed > 0 and elapsed_time > 0:
             avg_time_per_file = elapsed_time / processed
@@ -233,22 +298,66 @@ class MainWindow(QMainWindow):
     def update_status(self, text):
         self.status_label.setText(text)
 
+    def show_previous_results(self, folder):
+        """Show the groups saved by the last incremental scan of folder, if any."""
+        if not self.settings.get('incremental_scan', False):
+            return
+        snapshot = ScanSnapshot.load(folder, threshold=5, decode_size=self.settings.get('decode_target_size'))
+        if snapshot is None:
+            return
+        self.display_results(snapshot.to_results(blur_threshold=self.settings.get('blur_threshold', 50.0)))
+        self.execute_btn.setEnabled(True)
+        self.export_btn.setEnabled(True)
+        self.ai_select_btn.setEnabled(True)
+        self.status_label.setText("前回のスキャン結果を表示中 (再スキャンで最新の状態に更新)")
+
+    def scan_stopped(self):
+        self.scan_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.browse_btn.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        self.progress_detail_label.setVisible(False)
+        self.update_resume_button()
+        self.status_label.setText("スキャンを中断しました (「スキャン再開」で続きから再開できます)")
+
+    def scan_failed(self, message):
+        self.scan_stopped()
+        self.status_label.setText("スキャンに失敗しました (「スキャン再開」で続きから再開できます)")
+        QMessageBox.warning(self, "スキャンエラー", f"スキャン中にエラーが発生しました:\n{message}")
+
     def scan_finished(self, results):
-        self.results = results
         self.scan_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.update_resume_button()
         self.browse_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
         self.progress_detail_label.setVisible(False)
         self.status_label.setText("スキャン完了")
         self.execute_btn.setEnabled(True)
+        self.export_btn.setEnabled(True)
         self.ai_select_btn.setEnabled(True)
         
+        self.display_results(results)
+        
+        # Show statistics
+        self.show_statistics()
+
+    def display_results(self, results, actions=None):
+        """
+        Build the group list and actions from scan results. The actions
+        default to the rule engine's decisions unless they are given.
+        """
+        self.results = results
+        
         # Process results
         self.all_groups = []
         self.all_group_types = []
         self.blur_scores = {}
         self.actions = {}
         
+        # Blur scores of every scanned file, so rules need not decode again
+        self.blur_scores.update(self.results.get('blur_scores', {}))
+        
         # 1. Blurry Images
         blurry_images = self.results.get('blurry', [])
         if blurry_images:
@@ -268,14 +377,18 @@ class MainWindow(QMainWindow):
             self.all_group_types.append("重複・類似")
             
             # Apply rules
-            group_actions = RuleEngine.apply_rules(group)
-            self.actions.update(group_actions)
+            if actions is None:
+                group_actions = RuleEngine.apply_rules(group, blur_scores=self.blur_scores)
+                self.actions.update(group_actions)
+        
+        if actions is not None:
+            self.actions.update(actions)
+        
+        self.group_list.set_groups(self.all_groups, self.all_group_types, self.actions, self.blur_scores,
+                                   self.results.get('file_sizes'))
         
         # Apply filters to show filtered groups
         self.apply_filters(self.filter_criteria)
-        
-        # Show statistics
-        self.show_statistics()
 
     def on_group_selected(self, index):
         if 0 <= index < len(self.current_groups):
@@ -334,13 +447,10 @@ class MainWindow(QMainWindow):
 
     def on_delete_toggled(self, path, checked):
         self.actions[path] = 'delete' if checked else 'keep'
+        self.group_list.set_deleted(path, checked)
         
-        # Update Thumbnail Grid
-        if self.current_group_index >= 0:
-            group = self.current_groups[self.current_group_index]
-            if path in group:
-                if path in self.thumbnail_grid.widgets:
-                    self.thumbnail_grid.widgets[path].set_checked(checked)
+        # Update Thumbnail Grid (paths outside the shown group are ignored)
+        self.thumbnail_grid.set_checked(path, checked)
                     
         # Update Details if showing this path
         if self.detail_widget.current_path == path:
@@ -360,6 +470,47 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "完了", f"移動しました。\nログ: {log_path}")
             self.start_scan()
     
+    def export_report(self):
+        """Write the groups, per-file information and current actions to a JSONL or CSV report."""
+        if not self.results:
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "レポート出力", "report.jsonl",
+                                                   "JSON Lines (*.jsonl);;CSV (*.csv)")
+        if not file_path:
+            return
+        try:
+            with open(file_path, 'w', encoding='utf-8', newline='') as out:
+                ReportWriter.write_results(out, self.results, self.actions,
+                                           ReportWriter.format_for(file_path), self.selected_folder or None)
+        except OSError as e:
+            QMessageBox.warning(self, "エラー", f"レポートを書き出せませんでした。\n{e}")
+            return
+        self.status_label.setText(f"レポートを出力しました: {file_path}")
+    
+    def import_report(self):
+        """Show the groups of a report written by レポート出力 or the command-line scanner."""
+        file_path, _ = QFileDialog.getOpenFileName(self, "レポート読込", "",
+                                                   "レポート (*.jsonl *.csv);;すべてのファイル (*)")
+        if not file_path:
+            return
+        try:
+            results, actions = ReportReader.load(file_path)
+            folder = ReportReader.folder(file_path)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "エラー", f"レポートを読み込めませんでした。\n{e}")
+            return
+        # Files are moved into the scanned folder: without it the report can only be viewed
+        self.selected_folder = folder if folder and os.path.isdir(folder) else ""
+        self.path_label.setText(self.selected_folder or "フォルダ未選択")
+        self.scan_btn.setEnabled(bool(self.selected_folder))
+        self.update_resume_button()
+        # Keep the decisions recorded in the report instead of the default rules
+        self.display_results(results, actions)
+        self.execute_btn.setEnabled(bool(self.selected_folder))
+        self.export_btn.setEnabled(True)
+        self.ai_select_btn.setEnabled(True)
+        self.status_label.setText(f"レポートを読み込みました: {file_path}")
+    
     def batch_select_all_current_group(self):
         """Mark all files in current group as delete candidates"""
         if self.current_group_index < 0:
@@ -447,12 +598,12 @@ class MainWindow(QMainWindow):
         elif event.key() == Qt.Key_Up:
             new_index = self.current_group_index - 1
             if new_index >= 0:
-                self.group_list.list_widget.setCurrentRow(new_index)
+                self.group_list.set_current_row(new_index)
                 
         elif event.key() == Qt.Key_Down:
             new_index = self.current_group_index + 1
             if new_index < len(self.current_groups):
-                self.group_list.list_widget.setCurrentRow(new_index)
+                self.group_list.set_current_row(new_index)
                 
         elif event.key() == Qt.Key_Left:
             self.navigate_image(-1)
@@ -485,9 +636,7 @@ class MainWindow(QMainWindow):
                 # Update thumbnail selection
                 self.thumbnail_grid.select_path(new_path)
                 # Scroll to make it visible
-                if new_path in self.thumbnail_grid.widgets:
-                    widget = self.thumbnail_grid.widgets[new_path]
-                    self.thumbnail_grid.scroll.ensureWidgetVisible(widget)
+                self.thumbnail_grid.scroll_to(new_path)
         except ValueError:
             pass
     
@@ -495,32 +644,14 @@ class MainWindow(QMainWindow):
         """Apply filter criteria to groups"""
         self.filter_criteria = criteria
         
-        # Filter groups based on criteria
-        self.current_groups = []
-        self.current_group_types = []
-        
-        for i, (group, group_type) in enumerate(zip(self.all_groups, self.all_group_types)):
-            # Check group type filter
-            if group_type == "ブレ画像" and not criteria['show_blur']:
-                continue
-            if group_type == "重複・類似" and not criteria['show_duplicate']:
-                continue
-            
-            # Check status filter
-            has_delete = any(self.actions.get(path) == 'delete' for path in group)
-            if has_delete and not criteria['show_with_delete']:
-                continue
-            if not has_delete and not criteria['show_unprocessed']:
-                continue
-            
-            # Add to filtered groups
-            self.current_groups.append(group)
-            self.current_group_types.append(group_type)
+        # Filtering and sorting run on the group list's arrays
+        order = self.group_list.show_groups(criteria)
+        self.current_groups = [self.all_groups[i] for i in order]
+        self.current_group_types = [self.all_group_types[i] for i in order]
         
         # Update UI
-        self.group_list.set_groups(self.current_groups, self.current_group_types)
         if self.current_groups:
-            self.group_list.list_widget.setCurrentRow(0)
+            self.group_list.set_current_row(0)
     
     def show_statistics(self):
         """Show statistics dialog"""
@@ -540,7 +671,7 @@ class MainWindow(QMainWindow):
                 pass
         
         stats = {
-            'total_files_scanned': len(Scanner.scan_directory(self.selected_folder)) if self.selected_folder else 0,
+            'total_files_scanned': self.results.get('total_files', 0),
             'total_groups': len(self.all_groups),
             'blur_groups': blur_groups,
             'duplicate_groups': duplicate_groups,
@@ -588,6 +719,15 @@ class MainWindow(QMainWindow):
                         return
         event.ignore()
     
+    def closeEvent(self, event):
+        """Stop a running scan so that its checkpoint is written before exit."""
+        if self.scan_thread is not None and self.scan_thread.isRunning():
+            self.scan_thread.stop()
+            self.scan_thread.wait()
+        self.thumbnail_grid.loader.shutdown()
+        self.thumbnail_cache.close()
+        super().closeEvent(event)
+    
     def dragLeaveEvent(self, event):
         """Handle drag leave event"""
         # Reset background color
@@ -611,6 +751,8 @@ class MainWindow(QMainWindow):
                 self.selected_folder = folders[0]
                 self.path_label.setText(self.selected_folder)
                 self.scan_btn.setEnabled(True)
+                self.update_resume_button()
+                self.show_previous_results(self.selected_folder)
                 
                 # Optionally, auto-start scan
                 # Uncomment the next line to automatically start scanning after drop
@@ -624,108 +766,38 @@ class MainWindow(QMainWindow):
 
 
 class ScanWorker(QThread):
+    """Runs a ScanPipeline in a background thread and forwards its progress as signals."""
     progress = Signal(int)
-    progress_detail = Signal(str, int, int, float)
+    progress_detail = Signal(str, int, int, float, bool)
     status = Signal(str)
     finished = Signal(dict)
+    stopped = Signal()
+    failed = Signal(str)
     
-    def __init__(self, folder):
+    def __init__(self, folder, cache_path=None, content_fallback=False, workers=None, decode_size=None,
+                 walker_threads=1, incremental=False, blur_threshold=50.0, resume=False,
+                 thumbnail_dir=None, thumbnail_cache_bytes=512 * 1024 * 1024):
         super().__init__()
         self.folder = folder
-        self._should_stop = False
+        self.pipeline = ScanPipeline(folder, cache_path=cache_path, content_fallback=content_fallback,
+                                     workers=workers, decode_size=decode_size,
+                                     walker_threads=walker_threads, incremental=incremental,
+                                     blur_threshold=blur_threshold, resume=resume,
+                                     thumbnail_dir=thumbnail_dir,
+                                     thumbnail_cache_bytes=thumbnail_cache_bytes)
         
     def stop(self):
-        self._should_stop = True
+        self.pipeline.stop()
         
     def run(self):
-        import time
-        from core.cache import Cache
-        from core.video_hash import VideoHash
-        
-        start_time = time.time()
-        
-        # Load cache
-        cache = Cache()
-        cache.load(self.folder)
-        
-        self.status.emit("ファイルをスキャン中...")
-        files = Scanner.scan_directory(self.folder)
-        total = len(files)
-        
-        blurry_images = []
-        hashes = []
-        
-        # Process in batches to save memory
-        batch_size = 100
-        save_interval = 500  # Save cache every 500 files
-        
-        for i, f in enumerate(files):
-            if self._should_stop:
-                break
-                
-            try:
-                # Get file modification time
-                try:
-                    mtime = os.path.getmtime(f)
-                except:
-                    mtime = 0
-                    
-                # Check cache
-                cached = cache.get(f, mtime)
-                
-                # Determine if file is video
-                ext = os.path.splitext(f)[1].lower()
-                is_video = ext in {'.mp4', '.avi', '.mov', '.mkv'}
-                
-                if cached:
-                    # Use cached values
-                    h = cached.get('hash')
-                    score = cached.get('blur_score', 0)
-                else:
-                    # Compute new values
-                    if is_video:
-                        h = VideoHash.compute_hash(f)
-                        score = 0
-                    else:
-                        score = BlurDetector.calculate_blur_score(f)
-                        h = HashEngine.compute_hash(f)
-                    
-                    # Cache the results
-                    cache.set(f, mtime, h, score)
-                
-                # Add to results
-                if not is_video and BlurDetector.is_blurry(score):
-                    blurry_images.append((f, score))
-                    
-                hashes.append((f, h))
-                
-                # Emit progress less frequently for better performance
-                if i % 5 == 0:
-                    elapsed = time.time() - start_time
-                    self.progress_detail.emit(f, i + 1, total, elapsed)
-                    self.progress.emit(int((i / total) * 50))
-                
-                # Save cache periodically
-                if i % save_interval == 0 and i > 0:
-                    cache.save(self.folder)
-                    
-            except Exception as e:
-                print(f"Error processing {f}: {e}")
-                continue
-                
-        # Final cache save
-        cache.save(self.folder)
-        
-        if not self._should_stop:
-            self.status.emit("画像をグループ化中...")
-            groups = GroupBuilder.build_groups(hashes, threshold=5)
-            
-            self.progress.emit(100)
-            
-            results = {
-                'blurry': blurry_images,
-                'groups': groups
-            }
+        try:
+            results = self.pipeline.run(self.progress.emit, self.progress_detail.emit, self.status.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if results is None:
+            self.stopped.emit()
+        else:
             self.finished.emit(results)
 
 if __name__ == "__main__":
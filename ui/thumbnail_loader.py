@@ -0,0 +1,114 @@
+"""Background thumbnail decoding on a thread pool"""
+import os
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader, QImageIOHandler
+from core.scanner import Scanner
+from core.thumbnail_cache import ThumbnailCache
+
+
+def image_size(path) -> QSize:
+    """Displayed size of an image (EXIF rotation applied), read from its header only."""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and reader.transformation() & QImageIOHandler.TransformationRotate90:
+        size.transpose()
+    return size
+
+
+def read_scaled(path, width, height=None) -> QImage:
+    """
+    Decodes an image to fit in width x height without ever holding it at
+    full resolution: the scaled size is requested up front, so JPEGs are
+    decoded at 1/2, 1/4 or 1/8 scale by libjpeg. Images are never enlarged.
+    Returns a null QImage if the file cannot be decoded.
+    """
+    height = height or width
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid():
+        # The scaled size applies before the EXIF rotation
+        if reader.transformation() & QImageIOHandler.TransformationRotate90:
+            width, height = height, width
+        scaled = size.scaled(width, height, Qt.KeepAspectRatio)
+        if scaled.width() < size.width():
+            reader.setScaledSize(scaled)
+    return reader.read()
+
+
+class ThumbnailTask(QRunnable):
+    """Decodes one thumbnail to a QImage and hands it back to the loader."""
+
+    def __init__(self, loader, generation, path, size):
+        super().__init__()
+        self.loader = loader
+        self.generation = generation
+        self.path = path
+        self.size = size
+
+    def run(self):
+        # Requests of a group the user has left are dropped before decoding
+        if self.generation != self.loader.generation:
+            return
+        key, written = None, []
+        image = QImage()
+        directory = self.loader.cache.directory if self.loader.cache is not None else None
+        try:
+            if directory:
+                found = ThumbnailCache.fetch(directory, self.path, self.size)
+                if found is not None:
+                    thumbnail, key, written = found
+                    image = QImage(thumbnail)
+            if image.isNull():
+                image = read_scaled(self.path, self.size)
+            elif image.width() > self.size or image.height() > self.size:
+                image = image.scaled(self.size, self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        except Exception as e:
+            print(f"Failed to load thumbnail for {self.path}: {e}")
+        self.loader.finished.emit(self.generation, self.path, image, key, written)
+
+
+class ThumbnailLoader(QObject):
+    """
+    Decodes thumbnails on a QThreadPool so the GUI thread never decodes an
+    image. request() queues a path and loaded is emitted on the GUI thread
+    with a QImage scaled to the requested size (a null image if the file
+    cannot be decoded).
+
+    cancel() drops every outstanding request: queued tasks are removed from
+    the pool, running ones are ignored when they finish. The cache index is
+    only touched on the GUI thread, from the finished results.
+    """
+    loaded = Signal(str, QImage)  # path, thumbnail
+    finished = Signal(int, str, QImage, object, object)  # from the worker threads
+
+    def __init__(self, thumbnail_cache=None, threads=None):
+        super().__init__()
+        self.cache = thumbnail_cache
+        self.generation = 0
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(threads or max(1, min(4, (os.cpu_count() or 2) - 1)))
+        self.finished.connect(self.on_finished, Qt.QueuedConnection)
+
+    def request(self, path, size):
+        """Queues the thumbnail of path; videos have none and are skipped."""
+        if os.path.splitext(path)[1].lower() in Scanner.VIDEO_EXTENSIONS:
+            return
+        self.pool.start(ThumbnailTask(self, self.generation, path, size))
+
+    def cancel(self):
+        """Forgets every request made so far."""
+        self.generation += 1
+        self.pool.clear()
+
+    def shutdown(self):
+        """Cancels and waits for running tasks, e.g. before the cache is closed."""
+        self.cancel()
+        self.pool.waitForDone()
+
+    def on_finished(self, generation, path, image, key, written):
+        if key is not None and self.cache is not None:
+            self.cache.record(key, written)
+        if generation == self.generation:
+            self.loaded.emit(path, image)